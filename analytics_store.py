@@ -0,0 +1,205 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Pipeline stages with their own latency column, as named in show_professional_results.
+# Preprocessing is part of 'Decode': the upload is decoded straight to the model input.
+STAGE_COLUMNS = {
+    'Decode': 'decode_ms',
+    'Cache lookup': 'cache_lookup_ms',
+    'Inference': 'inference_ms',
+    'Report': 'report_ms',
+}
+
+# Stored in PRAGMA user_version; older databases are migrated by AnalyticsStore._migrate
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    model_version TEXT NOT NULL,
+    predicted_class TEXT,
+    confidence REAL,
+    risk_level TEXT NOT NULL,
+    cache_hit INTEGER NOT NULL,
+    total_ms REAL NOT NULL,
+    decode_ms REAL,
+    cache_lookup_ms REAL,
+    inference_ms REAL,
+    report_ms REAL
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_created_at ON analyses (created_at);
+
+-- Records are append-only
+CREATE TRIGGER IF NOT EXISTS analyses_no_update BEFORE UPDATE ON analyses
+BEGIN SELECT RAISE(ABORT, 'analyses is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS analyses_no_delete BEFORE DELETE ON analyses
+BEGIN SELECT RAISE(ABORT, 'analyses is append-only'); END;
+
+-- One row per day, model version, class and risk level, kept current on every insert,
+-- so reports read a few hundred rollup rows however many analyses there are.
+-- Each stage has its own count, since cache hits and failures skip some stages.
+CREATE TABLE IF NOT EXISTS daily_rollup (
+    day TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    predicted_class TEXT NOT NULL,
+    risk_level TEXT NOT NULL,
+    analyses INTEGER NOT NULL,
+    cache_hits INTEGER NOT NULL,
+    total_ms_sum REAL NOT NULL,
+    decodes INTEGER NOT NULL,
+    decode_ms_sum REAL NOT NULL,
+    inferences INTEGER NOT NULL,
+    inference_ms_sum REAL NOT NULL,
+    reports INTEGER NOT NULL,
+    report_ms_sum REAL NOT NULL,
+    PRIMARY KEY (day, model_version, predicted_class, risk_level)
+);
+CREATE TRIGGER IF NOT EXISTS analyses_rollup AFTER INSERT ON analyses
+BEGIN
+    INSERT INTO daily_rollup VALUES (
+        date(NEW.created_at, 'unixepoch'), NEW.model_version, COALESCE(NEW.predicted_class, ''),
+        NEW.risk_level, 1, NEW.cache_hit, NEW.total_ms,
+        NEW.decode_ms IS NOT NULL, COALESCE(NEW.decode_ms, 0),
+        NEW.inference_ms IS NOT NULL, COALESCE(NEW.inference_ms, 0),
+        NEW.report_ms IS NOT NULL, COALESCE(NEW.report_ms, 0)
+    )
+    ON CONFLICT (day, model_version, predicted_class, risk_level) DO UPDATE SET
+        analyses = analyses + 1,
+        cache_hits = cache_hits + excluded.cache_hits,
+        total_ms_sum = total_ms_sum + excluded.total_ms_sum,
+        decodes = decodes + excluded.decodes,
+        decode_ms_sum = decode_ms_sum + excluded.decode_ms_sum,
+        inferences = inferences + excluded.inferences,
+        inference_ms_sum = inference_ms_sum + excluded.inference_ms_sum,
+        reports = reports + excluded.reports,
+        report_ms_sum = report_ms_sum + excluded.report_ms_sum;
+END;
+"""
+
+# Rebuilds daily_rollup from the analyses log, for databases created before the current schema
+REBUILD_ROLLUP = """
+INSERT INTO daily_rollup
+SELECT date(created_at, 'unixepoch'), model_version, COALESCE(predicted_class, ''), risk_level,
+       COUNT(*), SUM(cache_hit), SUM(total_ms),
+       COUNT(decode_ms), COALESCE(SUM(decode_ms), 0),
+       COUNT(inference_ms), COALESCE(SUM(inference_ms), 0),
+       COUNT(report_ms), COALESCE(SUM(report_ms), 0)
+FROM analyses
+GROUP BY 1, 2, 3, 4
+"""
+
+
+class AnalyticsStore:
+    """Thread-safe, append-only SQLite log of analyses; reports read only the ``daily_rollup`` table"""
+
+    def __init__(self, path=os.path.join('data', 'analytics.db')):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL lets the reports page read while analyses are being written
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+
+        has_tables = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'analyses'").fetchone()
+        if has_tables and self._conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self._migrate()
+        else:
+            self._conn.executescript(SCHEMA)
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _migrate(self):
+        """Bring a version 1 database (with a preprocess stage, no per-stage counts) to the current schema"""
+        self._conn.executescript(f"""
+            BEGIN;
+            DROP TRIGGER IF EXISTS analyses_rollup;
+            DROP TABLE IF EXISTS daily_rollup;
+            ALTER TABLE analyses DROP COLUMN preprocess_ms;
+            {SCHEMA}
+            {REBUILD_ROLLUP};
+            COMMIT;
+        """)
+
+    def record(self, model_version, predicted_class, confidence, risk_level, total_seconds,
+               stage_timings=None, cache_hit=False, created_at=None):
+        """Append one analysis; ``stage_timings`` maps stage names to seconds"""
+        stage_timings = stage_timings or {}
+        stage_ms = {column: stage_timings[stage] * 1000 if stage in stage_timings else None
+                    for stage, column in STAGE_COLUMNS.items()}
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO analyses (created_at, model_version, predicted_class, confidence, risk_level, "
+                "cache_hit, total_ms, decode_ms, cache_lookup_ms, inference_ms, report_ms) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (created_at if created_at is not None else time.time(), model_version, predicted_class,
+                 confidence, risk_level, int(cache_hit), total_seconds * 1000, stage_ms['decode_ms'],
+                 stage_ms['cache_lookup_ms'], stage_ms['inference_ms'], stage_ms['report_ms'])
+            )
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def summary(self):
+        """Totals over every recorded analysis; each stage is averaged over the analyses that ran it"""
+        (analyses, cache_hits, total_ms, decodes, decode_ms, inferences, inference_ms, reports, report_ms,
+         high_risk, first_day, last_day) = self._query(
+            "SELECT COALESCE(SUM(analyses), 0), COALESCE(SUM(cache_hits), 0), SUM(total_ms_sum), "
+            "COALESCE(SUM(decodes), 0), SUM(decode_ms_sum), COALESCE(SUM(inferences), 0), SUM(inference_ms_sum), "
+            "COALESCE(SUM(reports), 0), SUM(report_ms_sum), "
+            "COALESCE(SUM(CASE WHEN risk_level = 'High Risk' THEN analyses END), 0), MIN(day), MAX(day) "
+            "FROM daily_rollup"
+        )[0]
+
+        if not analyses:
+            return {'analyses': 0}
+        return {
+            'analyses': analyses,
+            'cache_hit_rate': cache_hits / analyses,
+            'high_risk_rate': high_risk / analyses,
+            'mean_total_ms': total_ms / analyses,
+            'mean_decode_ms': decode_ms / decodes if decodes else None,
+            'mean_inference_ms': inference_ms / inferences if inferences else None,
+            'mean_report_ms': report_ms / reports if reports else None,
+            'first_day': first_day,
+            'last_day': last_day,
+        }
+
+    def class_distribution(self):
+        """``[(predicted_class, analyses)]``, most frequent first; failed analyses are left out"""
+        return self._query(
+            "SELECT predicted_class, SUM(analyses) AS n FROM daily_rollup WHERE predicted_class != '' "
+            "GROUP BY predicted_class ORDER BY n DESC"
+        )
+
+    def risk_distribution(self):
+        """``[(risk_level, analyses)]``, most frequent first"""
+        return self._query(
+            "SELECT risk_level, SUM(analyses) AS n FROM daily_rollup GROUP BY risk_level ORDER BY n DESC"
+        )
+
+    def daily_volume(self, days=30):
+        """``[(day, analyses, mean_total_ms)]`` for the last ``days`` days with any analyses, oldest first"""
+        return self._query(
+            "SELECT day, SUM(analyses), SUM(total_ms_sum) / SUM(analyses) FROM daily_rollup "
+            "WHERE day >= date('now', ?) GROUP BY day ORDER BY day",
+            (f"-{days - 1} days",)
+        )
+
+    def model_versions(self):
+        """``[(model_version, analyses, last_day)]``, most recently used first"""
+        return self._query(
+            "SELECT model_version, SUM(analyses), MAX(day) AS last_day FROM daily_rollup "
+            "GROUP BY model_version ORDER BY last_day DESC"
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
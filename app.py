@@ -1,10 +1,30 @@
-import streamlit as st
-import PIL.Image as Image
-import pandas as pd
-import plotly.express as px
+from startup_timing import IMPORT_BUDGET_SECONDS, import_time_total, startup_timings, timed_stage
+
+with timed_stage("import streamlit"):
+    import streamlit as st
+with timed_stage("import pandas/plotly"):
+    import pandas as pd
+    import plotly.express as px
+import os
+import sqlite3
 from datetime import datetime
 import time
-from model import SkinLesionModel  # Ensure model.py is in the same directory
+from concurrent.futures import ThreadPoolExecutor
+from prediction_cache import PredictionCache
+from analytics_store import AnalyticsStore
+import metrics
+from image_utils import UploadedImage
+from async_inference import AsyncInferenceFrontend, DeadlineExceededError, OverloadedError
+
+# Seconds an analysis may wait for the model, including time queued behind other sessions
+INFERENCE_TIMEOUT_SECONDS = 15.0
+
+# Inference backend: 'keras', 'tflite' (export_tflite.py) or 'onnx' (export_onnx.py, no TensorFlow import)
+MODEL_BACKEND = os.environ.get('SKIN_SOLUTIONS_BACKEND', 'keras')
+# Point this at a writable location when data/ is a read-only mount
+ANALYTICS_DB_PATH = os.environ.get('SKIN_SOLUTIONS_ANALYTICS_DB', os.path.join('data', 'analytics.db'))
+
+# model.py (TensorFlow, scikit-learn) is imported lazily by load_ml_model, so pages render without it
 
 # Page config
 st.set_page_config(
@@ -317,10 +337,81 @@ st.markdown("""
 
 
 # Load ML model function
-@st.cache_resource
 def load_ml_model():
+    if MODEL_BACKEND == 'onnx':
+        with timed_stage("model import (ONNX Runtime)"):
+            from onnx_predictor import OnnxSkinLesionModel
+        if OnnxSkinLesionModel.available():
+            with timed_stage("model load"):
+                return OnnxSkinLesionModel()
+        print("⚠️ No ONNX export found, run export_onnx.py; loading the Keras model instead")
+
+    with timed_stage("model import (TensorFlow, scikit-learn)"):
+        from model import SkinLesionModel  # Ensure model.py is in the same directory
     data_dir = "data"  # Make sure this path is correct relative to your app.py
-    return SkinLesionModel(data_dir, use_real_data=True)
+    # Serving only loads models; training happens offline via train.py
+    with timed_stage("model load"):
+        return SkinLesionModel(data_dir, use_real_data=True, allow_training=False,
+                               backend='keras' if MODEL_BACKEND == 'onnx' else MODEL_BACKEND)
+
+
+@st.cache_resource
+def start_model_loading():
+    """Start loading the model on a background thread, once per process; returns its Future"""
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader")
+    future = executor.submit(load_ml_model)
+    executor.shutdown(wait=False)
+    return future
+
+
+@st.cache_resource
+def get_analytics_store():
+    """Analytics store shared by every session in this process (a failed open is retried next call)"""
+    return AnalyticsStore(ANALYTICS_DB_PATH)
+
+
+def record_analysis(**fields):
+    """Append one analysis to the analytics store; a failure only costs that record"""
+    try:
+        get_analytics_store().record(**fields)
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️ Could not record analysis in {ANALYTICS_DB_PATH}: {e}")
+
+
+@st.cache_resource
+def get_prediction_cache():
+    """Prediction cache shared by every session in this process"""
+    return PredictionCache(max_entries=512)
+
+
+@st.cache_resource
+def get_inference_frontend():
+    """Bounded, asynchronous inference queue shared by every session in this process"""
+    model = get_model(wait=True)
+    if model is None:
+        # Raised rather than returned, so cache_resource does not keep the failure
+        raise RuntimeError("The model is not available")
+    # predict_inputs raises on model errors (predict_input would return a uniform placeholder),
+    # so a failed analysis reaches the caller as an error instead of being cached as a result
+    frontend = AsyncInferenceFrontend(lambda model_input: model.predict_inputs(model_input)[0],
+                                      max_queue_size=16, num_workers=1, default_timeout=INFERENCE_TIMEOUT_SECONDS)
+    frontend.run_in_background()
+    return frontend
+
+
+def get_model(wait=False):
+    """Return the shared model, or None if it failed or is still loading (unless ``wait``)"""
+    future = start_model_loading()
+    if not future.done() and not wait:
+        return None
+
+    try:
+        return future.result()
+    except Exception as e:
+        # Forget the failed load so the next rerun retries it instead of failing until restart
+        start_model_loading.clear()
+        st.error(f"Error loading model: {e}")
+        return None
 
 
 # Helper functions - defined BEFORE they are used
@@ -339,6 +430,7 @@ def get_clinical_significance(diagnosis):
 
 
 # Function to generate HTML content for the report
+@metrics.timed('report.render')
 def generate_report_html(uploaded_file_name, primary_diagnosis, confidence, risk_level, recommendation, results,
                          image_details, patient_details):
     report_date = datetime.now().strftime("%B %d, %Y at %I:%M %p")
@@ -438,7 +530,11 @@ def generate_report_html(uploaded_file_name, primary_diagnosis, confidence, risk
 def show_professional_results(image_details, patient_details):  # <-- Now accepts patient_details
     """Display professional analysis results"""
 
-    # Progress indicator
+    # Progress indicator, driven by the real pipeline stages
+    analysis_start = time.perf_counter()
+    stage_timings = {}
+    upload = st.session_state.get('current_image', None)
+
     progress_container = st.container()
     with progress_container:
         st.markdown("""
@@ -450,23 +546,43 @@ def show_professional_results(image_details, patient_details):  # <-- Now accept
         progress_bar = st.progress(0)
         status_text = st.empty()
 
-        analysis_steps = [
-            ("Initializing AI model...", 15),
-            ("Preprocessing image data...", 30),
-            ("Extracting morphological features...", 50),
-            ("Running classification algorithms...", 75),
-            ("Generating diagnostic report...", 90),
-            ("Finalizing analysis...", 100)
-        ]
-
-        for step, progress in analysis_steps:
-            status_text.text(f"{step}")
-            progress_bar.progress(progress)
-            time.sleep(0.6)
+        results_raw = None
+        cache_hit = False
+        if st.session_state.get('model') is not None and upload is not None:
+            # Reruns and re-uploads of the same photo are served from the cache without touching TensorFlow
+            stage_start = time.perf_counter()
+            prediction_cache = get_prediction_cache()
+            cache_key = PredictionCache.key(upload.data, st.session_state.model.model_version)
+            results_raw = prediction_cache.get(cache_key)
+            stage_timings['Cache lookup'] = time.perf_counter() - stage_start
+            cache_hit = results_raw is not None
+
+            if not cache_hit:
+                status_text.text("Decoding image data...")
+                progress_bar.progress(20)
+                # Decoding the upload at reduced scale produces the model input directly
+                model_input = upload.model_input()
+                stage_timings['Decode'] = upload.decode_seconds
+
+                status_text.text("Running classification...")
+                progress_bar.progress(40)
+                stage_start = time.perf_counter()
+                try:
+                    results_raw = get_inference_frontend().predict_blocking(model_input)
+                except OverloadedError:
+                    st.error("The analysis service is busy right now. Please try again in a moment.")
+                except DeadlineExceededError:
+                    st.error(f"The analysis did not finish within {INFERENCE_TIMEOUT_SECONDS:.0f}s. "
+                             "Please try again.")
+                except Exception as e:
+                    print(f"❌ Error: {e}")
+                    st.error("The analysis failed. Please try again or upload a different image.")
+                else:
+                    prediction_cache.put(cache_key, results_raw)
+                stage_timings['Inference'] = time.perf_counter() - stage_start
 
-        status_text.text("Analysis completed successfully")
-        time.sleep(0.5)
-        progress_container.empty()
+        status_text.text("Generating diagnostic report...")
+        progress_bar.progress(80)
 
     # Professional results display
     st.markdown("""
@@ -475,6 +591,7 @@ def show_professional_results(image_details, patient_details):  # <-- Now accept
         <p style="color: #64748b;">Generated on: {}</p>
     </div>
     """.format(datetime.now().strftime("%B %d, %Y at %I:%M %p")), unsafe_allow_html=True)
+    timing_summary = st.empty()
 
     # Get REAL predictions from the trained model
     results = {}
@@ -484,11 +601,7 @@ def show_professional_results(image_details, patient_details):  # <-- Now accept
     recommendation = "Please consult a medical professional."
 
     if 'model' in st.session_state and st.session_state.model is not None:
-        uploaded_file = st.session_state.get('current_image', None)
-        if uploaded_file is not None:
-            image = Image.open(uploaded_file)
-            results_raw = st.session_state.model.predict(image)
-
+        if upload is not None and results_raw is not None:
             class_mapping = {
                 'akiec': 'Actinic Keratosis', 'bcc': 'Basal Cell Carcinoma',
                 'bkl': 'Benign Keratosis', 'df': 'Dermatofibroma',
@@ -540,6 +653,10 @@ def show_professional_results(image_details, patient_details):  # <-- Now accept
                     alert_class = "alert-warning"
                     risk_level = "Low Confidence"
                     recommendation = "Inconclusive results - clinical examination recommended"
+        elif upload is not None:
+            alert_class = "alert-warning"
+            risk_level = "N/A"
+            recommendation = "Analysis could not be completed. Please try again."
         else:
             st.error("No image found for analysis")
             alert_class = "alert-warning"
@@ -569,8 +686,9 @@ def show_professional_results(image_details, patient_details):  # <-- Now accept
 
     # Download Report Button - placed below primary diagnosis
     # Generate the HTML content for the PDF
+    stage_start = time.perf_counter()
     pdf_html_content = generate_report_html(
-        uploaded_file_name=uploaded_file.name if 'uploaded_file' in locals() and uploaded_file else "N/A",
+        uploaded_file_name=upload.name if upload is not None else "N/A",
         primary_diagnosis=primary_diagnosis,
         confidence=confidence,
         risk_level=risk_level,
@@ -579,6 +697,26 @@ def show_professional_results(image_details, patient_details):  # <-- Now accept
         image_details=image_details,  # Pass image details
         patient_details=patient_details  # Pass patient details
     )
+    stage_timings['Report'] = time.perf_counter() - stage_start
+
+    progress_bar.progress(100)
+    progress_container.empty()
+
+    total_seconds = time.perf_counter() - analysis_start
+    stage_breakdown = " | ".join(f"{stage}: {seconds * 1000:.0f} ms" for stage, seconds in stage_timings.items())
+    cache_note = " - cached result" if cache_hit else ""
+    timing_summary.caption(f"Analysis completed in {total_seconds:.2f}s ({stage_breakdown}){cache_note}")
+
+    if upload is not None and st.session_state.get('model') is not None:
+        record_analysis(
+            model_version=st.session_state.model.model_version,
+            predicted_class=primary_diagnosis if results_raw else None,
+            confidence=confidence if results_raw else None,
+            risk_level=risk_level,
+            total_seconds=total_seconds,
+            stage_timings=stage_timings,
+            cache_hit=cache_hit,
+        )
 
     st.download_button(
         label="⬇️ Download Analysis Report (HTML)",
@@ -591,6 +729,9 @@ def show_professional_results(image_details, patient_details):  # <-- Now accept
     )
     st.info("Note: For a true PDF, save the downloaded HTML file and then 'Print to PDF' from your browser.")
 
+    if not results:
+        return
+
     # Detailed results
     st.markdown("""
     <div class="medical-card">
@@ -683,22 +824,18 @@ def main():
 def analysis_page():
     """Professional analysis interface"""
 
-    # Load model
-    try:
-        if 'model' not in st.session_state:
-            with st.spinner("Loading AI model..."):
-                st.session_state.model = load_ml_model()
-    except Exception as e:
-        st.error(f"Error loading model: {e}")
-        st.session_state.model = None
+    # Load model in the background so the page renders right away
+    if st.session_state.get('model') is None:
+        st.session_state.model = get_model()
+    model_status = "AI Model Online" if st.session_state.model is not None else "AI Model Loading..."
 
     # Sidebar with system status
     with st.sidebar:
-        st.markdown("""
+        st.markdown(f"""
         <div class="medical-card">
             <h3 style="color: #1e40af; margin-top: 0;" class="animated-text">System Status</h3>
             <div class="status-card">
-                <strong>AI Model Online</strong><br>
+                <strong>{model_status}</strong><br>
                 <small>MobileNetV2 Architecture</small>
             </div>
             <div class="status-card">
@@ -789,8 +926,13 @@ def analysis_page():
             </div>
             """, unsafe_allow_html=True)
 
-            image = Image.open(uploaded_file)
-            st.image(image, caption=f"Patient Image: {uploaded_file.name}", use_column_width=True)
+            # Decode each upload once per session; reruns reuse the same object
+            upload_id = getattr(uploaded_file, 'file_id', None) or (uploaded_file.name, uploaded_file.size)
+            if st.session_state.get('upload_id') != upload_id:
+                st.session_state['upload'] = UploadedImage(uploaded_file)
+                st.session_state['upload_id'] = upload_id
+            upload = st.session_state['upload']
+            st.image(upload.image, caption=f"Patient Image: {upload.name}", use_column_width=True)
 
             # Action buttons (Analyze, Save, Reset)
             col_btn1, col_btn2, col_btn3 = st.columns(3)
@@ -805,8 +947,8 @@ def analysis_page():
                 st.button("Reset", key="reset_analysis")
 
             # Image quality assessment
-            width, height = image.size
-            file_size_mb = len(uploaded_file.getvalue()) / (1024 * 1024)
+            width, height = upload.width, upload.height
+            file_size_mb = upload.size_mb
             image_quality_assessment = ""
             if width >= 224 and height >= 224:
                 image_quality_assessment = "Excellent"
@@ -827,14 +969,17 @@ def analysis_page():
 
             image_details = {
                 'dimensions': f"{width}x{height} pixels",
-                'format': image.format,
+                'format': upload.format,
                 'size_mb': file_size_mb,
                 'quality': image_quality_assessment
             }
 
             # Analysis results trigger
             if 'analyze_btn' in locals() and analyze_btn:
-                st.session_state['current_image'] = uploaded_file
+                if st.session_state.model is None:
+                    with st.spinner("Loading AI model..."):
+                        st.session_state.model = get_model(wait=True)
+                st.session_state['current_image'] = upload
                 st.session_state['current_image_details'] = image_details
                 st.session_state['current_patient_details'] = patient_details  # Store patient details
                 show_professional_results(image_details, patient_details)  # Pass both
@@ -844,6 +989,8 @@ def analysis_page():
                 del st.session_state['current_image_details']
             if 'current_patient_details' in st.session_state:
                 del st.session_state['current_patient_details']
+            for key in ('upload', 'upload_id'):
+                st.session_state.pop(key, None)
 
 
 def instructions_page():
@@ -924,40 +1071,43 @@ def reports_page():
     </div>
     """, unsafe_allow_html=True)
 
+    # Every figure comes from the rollup table, so this stays fast with millions of analyses
+    try:
+        store = get_analytics_store()
+        summary = store.summary()
+        class_rows = store.class_distribution()
+        risk_rows = store.risk_distribution()
+        daily_rows = store.daily_volume(days=30)
+        version_rows = store.model_versions()
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️ Could not read analytics from {ANALYTICS_DB_PATH}: {e}")
+        st.warning("Analytics are unavailable right now: the analytics database could not be read.")
+        return
+
+    if not summary['analyses']:
+        st.info("No analyses recorded yet. Metrics appear here once images have been analyzed.")
+        return
+
     # Key metrics
     col1, col2, col3, col4 = st.columns(4)
+    mean_inference_ms = summary['mean_inference_ms']
+    metric_tiles = [
+        (col1, f"{summary['analyses']:,}", "Total Analyses"),
+        (col2, f"{summary['mean_total_ms'] / 1000:.2f}s", "Avg Processing Time"),
+        (col3, f"{mean_inference_ms:.0f} ms" if mean_inference_ms is not None else "N/A", "Avg Inference Time"),
+        (col4, f"{summary['cache_hit_rate']:.1%}", "Cache Hit Rate"),
+    ]
+    for column, value, label in metric_tiles:
+        with column:
+            st.markdown(f"""
+            <div class="metric-professional">
+                <h3>{value}</h3>
+                <p>{label}</p>
+            </div>
+            """, unsafe_allow_html=True)
 
-    with col1:
-        st.markdown("""
-        <div class="metric-professional">
-            <h3>15,247</h3>
-            <p>Total Analyses</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-    with col2:
-        st.markdown("""
-        <div class="metric-professional">
-            <h3>94.2%</h3>
-            <p>Diagnostic Accuracy</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-    with col3:
-        st.markdown("""
-        <div class="metric-professional">
-            <h3>1.3s</h3>
-            <p>Avg Processing Time</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-    with col4:
-        st.markdown("""
-        <div class="metric-professional">
-            <h3>99.9%</h3>
-            <p>System Uptime</p>
-        </div>
-        """, unsafe_allow_html=True)
+    st.caption(f"Recorded from {summary['first_day']} to {summary['last_day']} (UTC); "
+               f"{summary['high_risk_rate']:.1%} of analyses were assessed as high risk.")
 
     # Analytics charts
     st.markdown("""
@@ -966,35 +1116,62 @@ def reports_page():
     </div>
     """, unsafe_allow_html=True)
 
-    # Sample data
-    diagnostic_data = {
-        'Diagnosis': ['Nevus', 'Melanoma', 'BCC', 'Actinic Keratosis', 'Seb. Keratosis', 'Dermatofibroma'],
-        'Count': [6520, 1430, 2800, 1960, 1890, 647],
-        'Accuracy': [96.2, 92.1, 94.8, 93.5, 95.1, 91.7]
-    }
-
     col_chart1, col_chart2 = st.columns(2)
 
     with col_chart1:
-        fig1 = px.pie(
-            values=diagnostic_data['Count'],
-            names=diagnostic_data['Diagnosis'],
-            title="Case Distribution by Diagnosis"
-        )
-        fig1.update_layout(font=dict(family="Inter, sans-serif"))
-        st.plotly_chart(fig1, use_container_width=True)
+        class_counts = pd.DataFrame(class_rows, columns=['Diagnosis', 'Count'])
+        if class_counts.empty:
+            st.info("No completed analyses yet.")
+        else:
+            fig1 = px.pie(
+                class_counts,
+                values='Count',
+                names='Diagnosis',
+                title="Case Distribution by Diagnosis"
+            )
+            fig1.update_layout(font=dict(family="Inter, sans-serif"))
+            st.plotly_chart(fig1, use_container_width=True)
 
     with col_chart2:
+        risk_counts = pd.DataFrame(risk_rows, columns=['Risk Level', 'Count'])
         fig2 = px.bar(
-            x=diagnostic_data['Diagnosis'],
-            y=diagnostic_data['Accuracy'],
-            title="Diagnostic Accuracy by Condition",
-            color=diagnostic_data['Accuracy'],
+            risk_counts,
+            x='Risk Level',
+            y='Count',
+            title="Cases by Risk Assessment",
+            color='Count',
             color_continuous_scale="Blues"
         )
         fig2.update_layout(font=dict(family="Inter, sans-serif"))
         st.plotly_chart(fig2, use_container_width=True)
 
+    st.markdown("""
+    <div class="medical-card">
+        <h2 style="color: #1e40af; margin-top: 0;">Usage and Performance</h2>
+    </div>
+    """, unsafe_allow_html=True)
+
+    col_chart3, col_chart4 = st.columns(2)
+
+    with col_chart3:
+        daily = pd.DataFrame(daily_rows, columns=['Day', 'Analyses', 'Avg Processing (ms)'])
+        fig3 = px.bar(daily, x='Day', y='Analyses', title="Daily Analyses (last 30 days)")
+        fig3.update_layout(font=dict(family="Inter, sans-serif"))
+        st.plotly_chart(fig3, use_container_width=True)
+
+    with col_chart4:
+        # Stages no analysis has run yet (e.g. only cache hits) are left out rather than shown as 0 ms
+        stages = [('Decode', summary['mean_decode_ms']), ('Inference', mean_inference_ms),
+                  ('Report', summary['mean_report_ms'])]
+        stage_means = pd.DataFrame([(stage, mean) for stage, mean in stages if mean is not None],
+                                   columns=['Stage', 'Mean (ms)'])
+        fig4 = px.bar(stage_means, x='Stage', y='Mean (ms)', title="Mean Latency by Pipeline Stage")
+        fig4.update_layout(font=dict(family="Inter, sans-serif"))
+        st.plotly_chart(fig4, use_container_width=True)
+
+    versions = pd.DataFrame(version_rows, columns=['Model Version', 'Analyses', 'Last Used'])
+    st.dataframe(versions, hide_index=True, use_container_width=True)
+
 
 def settings_page():
     """System settings and configuration"""
@@ -1029,6 +1206,57 @@ def settings_page():
         email_notifications = st.checkbox("Email Notifications", value=False)
         audit_logging = st.checkbox("Detailed Audit Logging", value=True)
 
+    # Startup timing breakdown
+    st.markdown("""
+    <div class="medical-card">
+        <h3>Startup Performance</h3>
+    </div>
+    """, unsafe_allow_html=True)
+
+    import_seconds = import_time_total()
+    if import_seconds <= IMPORT_BUDGET_SECONDS:
+        st.success(f"UI imports took {import_seconds:.2f}s (budget {IMPORT_BUDGET_SECONDS:.1f}s)")
+    else:
+        st.warning(f"UI imports took {import_seconds:.2f}s, over the {IMPORT_BUDGET_SECONDS:.1f}s budget")
+
+    st.dataframe(
+        pd.DataFrame(
+            [{'Stage': stage, 'Seconds': round(seconds, 3)} for stage, seconds in startup_timings().items()]
+        ),
+        hide_index=True,
+        use_container_width=True
+    )
+
+    cache_stats = get_prediction_cache().stats()
+    st.caption(
+        f"Prediction cache: {cache_stats['entries']}/{cache_stats['max_entries']} entries | "
+        f"{cache_stats['hits']} hits, {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%} hit rate)"
+    )
+
+    # Hot-path latency percentiles for this process (see metrics.py)
+    st.markdown("""
+    <div class="medical-card">
+        <h3>Latency Percentiles</h3>
+    </div>
+    """, unsafe_allow_html=True)
+
+    latency = metrics.snapshot()
+    if not metrics.is_enabled():
+        st.info("Latency instrumentation is disabled (SKIN_SOLUTIONS_METRICS=0).")
+    elif not latency:
+        st.info("No timings recorded yet. Analyze an image to populate this table.")
+    else:
+        st.dataframe(
+            pd.DataFrame([
+                {'Stage': name, 'Count': stats['count'], 'p50 (ms)': round(stats['p50_ms'], 2),
+                 'p95 (ms)': round(stats['p95_ms'], 2), 'p99 (ms)': round(stats['p99_ms'], 2),
+                 'Max (ms)': round(stats['max_ms'], 2)}
+                for name, stats in latency.items()
+            ]),
+            hide_index=True,
+            use_container_width=True
+        )
+
 
 def show_footer():
     st.markdown("""
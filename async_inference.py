@@ -0,0 +1,126 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class OverloadedError(Exception):
+    """Raised immediately when the inference queue is full"""
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a request is not answered before its deadline"""
+
+
+class AsyncInferenceFrontend:
+    """Asynchronous, admission-controlled front end for a blocking predict function.
+
+    Requests wait in a bounded queue and are scored by ``num_workers`` workers,
+    each running ``predict_fn`` (e.g. ``SkinLesionModel.predict_input``) on a
+    thread pool. A request that finds the queue full fails fast with
+    ``OverloadedError``; one that is not answered within its timeout raises
+    ``DeadlineExceededError``. Requests that expire or are cancelled while
+    still queued are dropped without ever reaching the model.
+
+    Use ``await predict(...)`` from asyncio code, or call ``run_in_background``
+    once and then ``predict_blocking(...)`` from ordinary threads.
+    """
+
+    def __init__(self, predict_fn, max_queue_size=32, num_workers=1, default_timeout=10.0):
+        self.predict_fn = predict_fn
+        self.max_queue_size = max_queue_size
+        self.num_workers = num_workers
+        self.default_timeout = default_timeout
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.cancelled = 0
+        self._queue = None
+        self._workers = []
+        self._loop = None
+        self._executor = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="inference")
+
+    def _ensure_workers(self):
+        """Create the queue and workers on the running loop the first time it is used"""
+        if self._queue is None:
+            self._loop = asyncio.get_running_loop()
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.num_workers)]
+
+    async def predict(self, item, timeout=None):
+        """Score ``item`` with ``predict_fn``, failing fast when overloaded"""
+        self._ensure_workers()
+        timeout = self.default_timeout if timeout is None else timeout
+
+        if self._queue.full():
+            self.rejected += 1
+            raise OverloadedError(f"Inference queue is full ({self.max_queue_size} requests waiting)")
+
+        future = self._loop.create_future()
+        self._queue.put_nowait((item, future, self._loop.time() + timeout))
+
+        try:
+            # wait_for cancels the future on timeout or caller cancellation, which the worker checks
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise DeadlineExceededError(f"No prediction within {timeout:.1f}s") from None
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+    async def _worker(self):
+        while True:
+            item, future, deadline = await self._queue.get()
+            try:
+                if future.done():
+                    continue
+                if self._loop.time() >= deadline:
+                    future.set_exception(DeadlineExceededError("Deadline passed while queued"))
+                    continue
+
+                result = await self._loop.run_in_executor(self._executor, self.predict_fn, item)
+                self.completed += 1
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def run_in_background(self):
+        """Run the front end on its own event loop thread, for use from synchronous code"""
+        if self._loop is not None:
+            return self._loop
+
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(ready.set)
+            loop.run_forever()
+
+        threading.Thread(target=run, name="inference-frontend", daemon=True).start()
+        ready.wait()
+        asyncio.run_coroutine_threadsafe(self._start(), loop).result()
+        return loop
+
+    async def _start(self):
+        self._ensure_workers()
+
+    def predict_blocking(self, item, timeout=None):
+        """Synchronous ``predict`` for a front end started with ``run_in_background``"""
+        if self._loop is None:
+            raise RuntimeError("Call run_in_background() before predict_blocking()")
+        return asyncio.run_coroutine_threadsafe(self.predict(item, timeout), self._loop).result()
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'max_queue_size': self.max_queue_size,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'cancelled': self.cancelled,
+        }
@@ -0,0 +1,108 @@
+
+import numpy as np
+
+import metrics
+from image_utils import to_model_input
+
+
+class BasePredictor:
+    """Prediction API shared by every classifier backend.
+
+    Subclasses set ``class_names`` and ``model_version`` and implement
+    ``_run_model``, which maps a ``(N, 224, 224, 3)`` uint8 batch to an
+    ``(N, num_classes)`` array of probabilities. This module must not import
+    TensorFlow, so that TensorFlow-free backends can build on it.
+    """
+
+    class_names = []
+    model_version = None
+
+    def _run_model(self, inputs):
+        raise NotImplementedError
+
+    @metrics.timed('predict.preprocess')
+    def preprocess_image(self, image):
+        """Resize image to a uint8 model input batch (the model normalizes it)"""
+        return to_model_input(image)
+
+    def _forward(self, inputs):
+        # Normalization is the model's first layer, so it is part of the forward pass
+        with metrics.timer('model.forward'):
+            return self._run_model(inputs)
+
+    def _to_result(self, probabilities):
+        """Map one row of model output to a ``{class_name: probability}`` dict"""
+        return {class_name: float(probabilities[i]) for i, class_name in enumerate(self.class_names)}
+
+    def _uniform_result(self):
+        return {class_name: 1.0 / len(self.class_names) for class_name in self.class_names}
+
+    @metrics.timed('predict.total')
+    def predict(self, image):
+        """Make prediction"""
+        try:
+            processed_image = self.preprocess_image(image)
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            # Return dummy predictions
+            return self._uniform_result()
+
+        return self.predict_input(processed_image)
+
+    def predict_input(self, img_array):
+        """Make prediction from an input already built by ``preprocess_image``"""
+        try:
+            predictions = self._forward(img_array)
+
+            with metrics.timer('predict.result_mapping'):
+                return self._to_result(predictions[0])
+
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            # Return dummy predictions
+            return self._uniform_result()
+
+    def predict_batch(self, images, batch_size=32):
+        """Predict many images (any size or mode), ``batch_size`` at a time.
+
+        Returns one ``{class_name: probability}`` dict per input, in order.
+        An image that cannot be preprocessed gets ``None`` and is reported on
+        its own; the rest of its batch is still scored.
+        """
+        results = [None] * len(images)
+
+        for start in range(0, len(images), batch_size):
+            chunk = images[start:start + batch_size]
+            batch = np.empty((len(chunk), 224, 224, 3), dtype=np.uint8)
+            positions = []
+
+            for offset, image in enumerate(chunk):
+                try:
+                    batch[len(positions)] = self.preprocess_image(image)[0]
+                    positions.append(start + offset)
+                except Exception as e:
+                    print(f"❌ Error preprocessing image {start + offset}: {e}")
+
+            if not positions:
+                continue
+
+            try:
+                batch_results = self.predict_inputs(batch[:len(positions)])
+            except Exception as e:
+                print(f"❌ Error predicting images {positions[0]}-{positions[-1]}: {e}")
+                continue
+
+            for position, result in zip(positions, batch_results):
+                results[position] = result
+
+        return results
+
+    def predict_inputs(self, inputs):
+        """Score a ``(N, 224, 224, 3)`` uint8 batch of preprocessed inputs in one call.
+
+        Returns one ``{class_name: probability}`` dict per row. Unlike
+        ``predict``, errors are raised to the caller.
+        """
+        predictions = self._forward(inputs)
+        with metrics.timer('predict.result_mapping'):
+            return [self._to_result(probabilities) for probabilities in predictions]
@@ -0,0 +1,69 @@
+"""Compare full-resolution decode + resize with the draft-mode decode path.
+
+Synthetic JPEGs are generated in a temporary directory, so no dataset is needed:
+    python benchmarks/bench_decode.py --repeats 20
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from image_utils import MODEL_INPUT_SIZE, RESAMPLE, decode_image  # noqa: E402
+
+# (label, width, height) of the synthetic images
+IMAGE_SIZES = [
+    ('HAM10000 (600x450)', 600, 450),
+    ('Phone 12 MP (4000x3000)', 4000, 3000),
+]
+
+
+def make_jpeg(width, height, seed=0):
+    """Encode a smooth random image (JPEG-friendly, unlike white noise) and return its bytes"""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (height // 16 + 1, width // 16 + 1, 3), dtype=np.uint8)
+    image = Image.fromarray(small).resize((width, height), Image.Resampling.BILINEAR)
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def full_decode(data):
+    """The previous path: decode every pixel, then resize"""
+    image = Image.open(io.BytesIO(data)).convert('RGB')
+    return np.asarray(image.resize(MODEL_INPUT_SIZE, RESAMPLE), dtype=np.uint8)
+
+
+def draft_decode(data):
+    return decode_image(io.BytesIO(data))
+
+
+def time_per_call(func, data, repeats):
+    func(data)  # warm up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(data)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    print(f"{'image':<26}{'full decode':>14}{'draft decode':>15}{'speedup':>10}")
+    for label, width, height in IMAGE_SIZES:
+        data = make_jpeg(width, height)
+        full = time_per_call(full_decode, data, args.repeats)
+        draft = time_per_call(draft_decode, data, args.repeats)
+        print(f"{label:<26}{full * 1000:>11.1f} ms{draft * 1000:>12.1f} ms{full / draft:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
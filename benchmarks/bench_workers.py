@@ -0,0 +1,89 @@
+"""Throughput and per-worker memory of the multi-process inference pool.
+
+Uses the saved model artifact if there is one, else the demo model:
+    python benchmarks/bench_workers.py --workers 1 2 4 --duration 10
+
+Memory is read from /proc/<pid>/smaps_rollup (Linux only). PSS splits shared
+pages between the processes mapping them, so it is the fair per-worker cost;
+USS is what stopping that one worker would free.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from worker_pool import WEIGHTS_FILE, InferenceWorkerPool  # noqa: E402
+
+
+def process_memory_mb(pid):
+    """Return RSS, PSS and USS of ``pid`` in MB, or None where /proc is unavailable"""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            fields = {line.split(':')[0]: int(line.split()[1]) for line in f if line.endswith('kB\n')}
+    except OSError:
+        return None
+
+    uss_kb = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    return {'rss_mb': fields['Rss'] / 1024, 'pss_mb': fields['Pss'] / 1024, 'uss_mb': uss_kb / 1024}
+
+
+def run_load(pool, concurrency, duration):
+    """Keep ``concurrency`` requests in flight for ``duration`` seconds; return completed requests per second"""
+    model_input = np.random.default_rng(0).integers(0, 256, (224, 224, 3), dtype=np.uint8)
+    stop_at = time.perf_counter() + duration
+    counts = [0] * concurrency
+
+    def client(index):
+        while time.perf_counter() < stop_at:
+            pool.submit(model_input).result()
+            counts[index] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds of load per worker count")
+    parser.add_argument('--concurrency', type=int, default=16, help="requests kept in flight")
+    parser.add_argument('--max-batch-size', type=int, default=8)
+    parser.add_argument('--data-dir', default='data')
+    args = parser.parse_args(argv)
+
+    from model import SkinLesionModel
+    model = SkinLesionModel(args.data_dir, use_real_data=True, allow_training=False)
+    print(f"cpus: {os.cpu_count()}, model: {model.model_version}")
+
+    for num_workers in args.workers:
+        pool = InferenceWorkerPool(model, num_workers=num_workers, max_batch_size=args.max_batch_size)
+        try:
+            run_load(pool, args.concurrency, min(2.0, args.duration))  # warm-up
+            throughput = run_load(pool, args.concurrency, args.duration)
+
+            summary = {
+                'workers': num_workers,
+                'throughput_rps': throughput,
+                'weights_file_mb': os.path.getsize(os.path.join(pool.weights_dir, WEIGHTS_FILE)) / 1e6,
+            }
+            memory = [process_memory_mb(pid) for pid in pool.worker_pids()]
+            if all(memory):
+                for key in ('rss_mb', 'pss_mb', 'uss_mb'):
+                    summary[f"mean_worker_{key}"] = sum(m[key] for m in memory) / len(memory)
+            print(json.dumps(summary))
+        finally:
+            pool.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Concurrent load generator for serve.py.
+
+Start the server, then:
+    python benchmarks/load_generator.py --url http://127.0.0.1:8080 --concurrency 16 --duration 20
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_decode import make_jpeg  # noqa: E402
+
+
+def run_client(url, body, stop_at, latencies, errors, lock):
+    request_url = url.rstrip('/') + '/predict'
+    while time.perf_counter() < stop_at:
+        request = urllib.request.Request(request_url, data=body, headers={'Content-Type': 'image/jpeg'})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+        except (urllib.error.URLError, OSError):
+            with lock:
+                errors.append(time.perf_counter() - start)
+
+
+def run_load(url, concurrency, duration, body):
+    """Hammer ``url`` from ``concurrency`` threads for ``duration`` seconds and summarize"""
+    latencies, errors, lock = [], [], threading.Lock()
+    stop_at = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=run_client, args=(url, body, stop_at, latencies, errors, lock))
+        for _ in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    summary = {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'throughput_rps': len(latencies) / elapsed,
+    }
+    if latencies:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+        summary.update(p50_ms=p50, p95_ms=p95, p99_ms=p99)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8080')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument('--image-size', type=int, nargs=2, default=(600, 450), metavar=('WIDTH', 'HEIGHT'))
+    args = parser.parse_args(argv)
+
+    body = make_jpeg(*args.image_size)
+    for concurrency in args.concurrency:
+        summary = run_load(args.url, concurrency, args.duration, body)
+        print(json.dumps(summary))
+
+    try:
+        with urllib.request.urlopen(args.url.rstrip('/') + '/stats', timeout=10) as response:
+            print(f"server batching: {response.read().decode('utf-8')}")
+    except (urllib.error.URLError, OSError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
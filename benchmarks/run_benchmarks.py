@@ -0,0 +1,276 @@
+"""Reproducible benchmark suite for data loading and inference, with JSON output.
+
+Runs offline: images are synthetic JPEGs generated for a per-class sample of
+the bundled HAM10000_metadata.csv (same seeds every run), unless --data-dir
+points at a real dataset. Each benchmark runs in a fresh interpreter so that
+peak memory and cold start are measured in isolation.
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --output new.json --compare results.json --tolerance 0.15
+
+With --compare the exit status is 1 if any metric regressed by more than the
+tolerance against the baseline file.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Metric name suffixes and whether bigger is better, for --compare
+HIGHER_IS_BETTER = ('_per_second',)
+LOWER_IS_BETTER = ('_seconds', '_ms', '_mb')
+
+
+def peak_rss_mb():
+    """High-water mark of this process's resident memory (Linux), or None"""
+    try:
+        with open('/proc/self/status') as f:
+            return next(int(line.split()[1]) for line in f if line.startswith('VmHWM:')) / 1024
+    except (OSError, StopIteration):
+        return None
+
+
+def make_synthetic_dataset(data_dir, per_class, image_size=(600, 450)):
+    """Write a per-class sample of the bundled metadata plus one synthetic JPEG per image"""
+    import pandas as pd
+    from bench_decode import make_jpeg
+
+    metadata = pd.read_csv(os.path.join(REPO_DIR, 'HAM10000_metadata.csv'))
+    sample = metadata.groupby('dx', sort=True).head(per_class)
+
+    image_dir = os.path.join(data_dir, 'HAM10000_images_part_1')
+    os.makedirs(image_dir, exist_ok=True)
+    sample.to_csv(os.path.join(data_dir, 'HAM10000_metadata.csv'), index=False)
+    for seed, image_id in enumerate(sample['image_id']):
+        with open(os.path.join(image_dir, f"{image_id}.jpg"), 'wb') as f:
+            f.write(make_jpeg(*image_size, seed=seed))
+    return len(sample)
+
+
+# --- Benchmarks, each run in its own interpreter via --run NAME ---
+
+def bench_loader(args):
+    """create_balanced_dataset throughput straight from JPEGs, then from the image cache"""
+    from data_loader import HAM10000DataLoader
+
+    loader = HAM10000DataLoader(args.data_dir)
+    loader.load_metadata()
+
+    start = time.perf_counter()
+    images, _ = loader.create_balanced_dataset(args.max_per_class, num_workers=args.num_workers, use_cache=False)
+    decode_seconds = time.perf_counter() - start
+    results = {
+        'images': len(images),
+        'decode_seconds': decode_seconds,
+        'decode_images_per_second': len(images) / decode_seconds,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    del images
+
+    start = time.perf_counter()
+    loader.build_image_cache(num_workers=args.num_workers)
+    results['cache_build_seconds'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    images, _ = loader.create_balanced_dataset(args.max_per_class, num_workers=args.num_workers, use_cache=True)
+    results['cached_images_per_second'] = len(images) / (time.perf_counter() - start)
+    return results
+
+
+def bench_predict(args):
+    """SkinLesionModel.predict latency at batch size 1 and predict_inputs throughput at larger batches"""
+    import io
+
+    import numpy as np
+    from PIL import Image
+
+    from bench_decode import make_jpeg
+    from model import SkinLesionModel
+    from model_registry import ModelRegistry
+
+    model = SkinLesionModel(args.data_dir, allow_training=False, registry=ModelRegistry(args.models_dir))
+    image = Image.open(io.BytesIO(make_jpeg(600, 450, seed=0)))
+    image.load()
+
+    model.predict(image)  # warm up
+    latencies = []
+    for _ in range(args.predict_runs):
+        start = time.perf_counter()
+        model.predict(image)
+        latencies.append(time.perf_counter() - start)
+    p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+    results = {'model_version': model.model_version, 'predict_p50_ms': p50, 'predict_p95_ms': p95}
+
+    rng = np.random.default_rng(0)
+    for batch_size in args.batch_sizes:
+        batch = rng.integers(0, 256, (batch_size, 224, 224, 3), dtype=np.uint8)
+        model.predict_inputs(batch)  # warm up
+        batches = max(1, args.predict_runs // batch_size)
+        start = time.perf_counter()
+        for _ in range(batches):
+            model.predict_inputs(batch)
+        results[f"batch{batch_size}_images_per_second"] = batches * batch_size / (time.perf_counter() - start)
+    return results
+
+
+def bench_cold_start(args):
+    """Import the web app, then load_ml_model() and one prediction, as on a fresh server process"""
+    import numpy as np
+
+    start = time.perf_counter()
+    import app
+    imported = time.perf_counter()
+    model = app.load_ml_model()
+    loaded = time.perf_counter()
+    model.predict_inputs(np.zeros((1, 224, 224, 3), dtype=np.uint8))
+    predicted = time.perf_counter()
+    return {
+        'app_import_seconds': imported - start,
+        'load_ml_model_seconds': loaded - imported,
+        'first_prediction_seconds': predicted - loaded,
+        'cold_start_seconds': predicted - start,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+BENCHMARKS = {
+    'loader': bench_loader,
+    'predict': bench_predict,
+    'cold_start': bench_cold_start,
+}
+
+
+def run_isolated(name, args, cwd):
+    """Run benchmark ``name`` in a fresh interpreter and return its results dict"""
+    command = [sys.executable, os.path.abspath(__file__), '--run', name,
+               '--data-dir', args.data_dir, '--models-dir', args.models_dir,
+               '--max-per-class', str(args.max_per_class), '--predict-runs', str(args.predict_runs),
+               '--batch-sizes', *map(str, args.batch_sizes)]
+    if args.num_workers is not None:
+        command += ['--num-workers', str(args.num_workers)]
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.abspath(REPO_DIR),
+                                                       os.environ.get('PYTHONPATH', '')]))
+    completed = subprocess.run(command, cwd=cwd, env=env, capture_output=True, text=True)
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        print(completed.stderr[-2000:], file=sys.stderr)
+        raise RuntimeError(f"Benchmark {name} failed with exit status {completed.returncode}")
+    return json.loads(lines[-1])
+
+
+def run_metadata():
+    """Environment details stored next to the results, so runs can be compared like for like"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return ``[(metric, baseline, current, change)]`` for metrics worse than ``tolerance``"""
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get(name, {}).get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+            change = (value - old) / old
+            if metric.endswith(HIGHER_IS_BETTER) and change < -tolerance:
+                regressions.append((f"{name}.{metric}", old, value, change))
+            elif metric.endswith(LOWER_IS_BETTER) and change > tolerance:
+                regressions.append((f"{name}.{metric}", old, value, change))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default='benchmark_results.json', help="JSON file the results are written to")
+    parser.add_argument('--compare', metavar='BASELINE', help="earlier results file to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="relative change that counts as a regression (default 15%%)")
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument('--data-dir', help="real HAM10000 data directory (default: generate synthetic JPEGs); "
+                                           "its image cache is (re)built by the loader benchmark")
+    parser.add_argument('--models-dir', default=os.path.join(REPO_DIR, 'models'),
+                        help="model registry to load (the demo model is used if it is empty)")
+    parser.add_argument('--max-per-class', type=int, default=50)
+    parser.add_argument('--num-workers', type=int, default=None, help="image decode workers (default: all cores)")
+    parser.add_argument('--predict-runs', type=int, default=50)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[8, 32])
+    parser.add_argument('--run', choices=sorted(BENCHMARKS), help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.run:
+        # Child process: progress messages go to stdout too, so the results are the last line
+        print(json.dumps(BENCHMARKS[args.run](args)))
+        return 0
+
+    synthetic = args.data_dir is None
+    with tempfile.TemporaryDirectory(prefix='ham10000-bench-') as work_dir:
+        if synthetic:
+            args.data_dir = os.path.join(work_dir, 'data')
+            count = make_synthetic_dataset(args.data_dir, args.max_per_class)
+            print(f"🧪 Generated {count} synthetic JPEGs in {args.data_dir}")
+        args.data_dir = os.path.abspath(args.data_dir)
+        args.models_dir = os.path.abspath(args.models_dir)
+
+        # load_ml_model reads ./data and ./models, so the cold start runs from a directory laid out that way
+        app_dir = os.path.join(work_dir, 'app')
+        os.makedirs(app_dir)
+        os.symlink(args.data_dir, os.path.join(app_dir, 'data'))
+        if os.path.isdir(args.models_dir):
+            os.symlink(args.models_dir, os.path.join(app_dir, 'models'))
+
+        results = {}
+        for name in args.only or BENCHMARKS:
+            print(f"⏱️ Running {name} benchmark...")
+            results[name] = run_isolated(name, args, cwd=app_dir)
+            print(f"   {json.dumps(results[name])}")
+
+    report = {'meta': run_metadata(), 'config': {
+        'synthetic_data': synthetic,
+        'max_per_class': args.max_per_class,
+        'num_workers': args.num_workers,
+        'predict_runs': args.predict_runs,
+        'batch_sizes': args.batch_sizes,
+    }, 'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for metric, old, new, change in regressions:
+            print(f"❌ {metric}: {old:.4g} -> {new:.4g} ({change:+.0%})")
+        if regressions:
+            return 1
+        print(f"✅ No regressions beyond {args.tolerance:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
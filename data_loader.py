@@ -1,18 +1,68 @@
 import pandas as pd
 import numpy as np
 import os
-from PIL import Image
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-import tensorflow as tf
+import json
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from image_utils import DECODER_VERSION, decode_image
+import metrics
+
+# scikit-learn and TensorFlow are imported inside the methods that need them,
+# so that reading metadata or building the image cache stays cheap to import
+
+
+IMAGE_DIRS = ('HAM10000_images_part_1', 'HAM10000_images_part_2')
+
+# How sample_balanced evens out the classes:
+#   undersample - at most max_per_class images per class
+#   oversample  - exactly max_per_class per class, repeating images of smaller classes
+#   lesion      - like undersample, but at most one image per lesion_id
+SAMPLING_STRATEGIES = ('undersample', 'oversample', 'lesion')
+
+# Bump whenever lesion_split or train_val_split can select different images, so
+# saved splits are recomputed and models trained on the old split are retrained
+SPLIT_VERSION = 'lesion-sgkf-1'
+
+
+def _load_image_task(img_path, image_id, img_size):
+    """Decode and resize one image to uint8 (module level so process pools can pickle it)"""
+    if img_path is None:
+        return None
+
+    try:
+        return decode_image(img_path, img_size)
+    except Exception as e:
+        print(f"❌ Error loading image {image_id}: {e}")
+        return None
+
+
+class ImageCache:
+    """Read-only, memory-mapped uint8 images written by ``HAM10000DataLoader.build_image_cache``"""
+
+    def __init__(self, images, rows, img_size):
+        self.images = images
+        self.rows = rows
+        self.img_size = img_size
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get(self, image_id):
+        """Return a zero-copy view of the cached image, or None if it is not cached"""
+        row = self.rows.get(image_id)
+        if row is None:
+            return None
+        return self.images[row]
 
 
 class HAM10000DataLoader:
     def __init__(self, data_dir):
         self.data_dir = data_dir
         self.metadata = None
-        self.label_encoder = LabelEncoder()
+        self.label_encoder = None
         self.class_names = []
+        self.image_paths = None
+        self._image_caches = {}
 
     def load_metadata(self):
         """Load the HAM10000 metadata CSV file"""
@@ -29,72 +79,462 @@ class HAM10000DataLoader:
         print(self.metadata['dx'].value_counts())
 
         # Encode labels
+        from sklearn.preprocessing import LabelEncoder
+        self.label_encoder = LabelEncoder()
         self.metadata['label'] = self.label_encoder.fit_transform(self.metadata['dx'])
         self.class_names = self.label_encoder.classes_.tolist()
 
+        self.load_path_index()
+
         return self.metadata
 
+    def _path_index_file(self):
+        return os.path.join(self.data_dir, 'HAM10000_image_index.json')
+
+    def _image_dir_mtimes(self):
+        """Return the mtime of each image directory; it changes whenever files are added or removed"""
+        mtimes = {}
+        for folder in IMAGE_DIRS:
+            folder_path = os.path.join(self.data_dir, folder)
+            mtimes[folder] = os.stat(folder_path).st_mtime_ns if os.path.isdir(folder_path) else None
+        return mtimes
+
+    def build_path_index(self):
+        """Scan each image directory once and save an ``image_id -> path`` index next to the metadata"""
+        paths = {}
+        # Later folders must not shadow earlier ones, matching the old part_1-then-part_2 lookup
+        for folder in reversed(IMAGE_DIRS):
+            folder_path = os.path.join(self.data_dir, folder)
+            if not os.path.isdir(folder_path):
+                continue
+            with os.scandir(folder_path) as entries:
+                for entry in entries:
+                    image_id, ext = os.path.splitext(entry.name)
+                    if ext == '.jpg' and entry.is_file():
+                        paths[image_id] = os.path.join(folder, entry.name)
+
+        print(f"🗂️ Indexed {len(paths)} images")
+
+        # The data directory may be a read-only mount; the index is then only kept in memory
+        index_file = self._path_index_file()
+        try:
+            with open(index_file + '.tmp', 'w') as f:
+                json.dump({'dir_mtimes': self._image_dir_mtimes(), 'paths': paths}, f)
+            os.replace(index_file + '.tmp', index_file)
+        except OSError as e:
+            print(f"⚠️ Could not save the image index ({e}), keeping it in memory")
+        return paths
+
+    def load_path_index(self):
+        """Load the saved ``image_id -> path`` index, rebuilding it if the image folders changed"""
+        index_file = self._path_index_file()
+        paths = None
+        if os.path.exists(index_file):
+            with open(index_file) as f:
+                index = json.load(f)
+            if index.get('dir_mtimes') == self._image_dir_mtimes():
+                paths = index['paths']
+
+        if paths is None:
+            paths = self.build_path_index()
+
+        self.image_paths = {image_id: os.path.join(self.data_dir, path) for image_id, path in paths.items()}
+        self._report_index_mismatches()
+        return self.image_paths
+
+    def _report_index_mismatches(self):
+        """Print metadata rows without an image file and image files without a metadata row"""
+        if self.metadata is None:
+            return
+
+        known_ids = set(self.metadata['image_id'])
+        missing = sorted(known_ids.difference(self.image_paths))
+        orphaned = sorted(set(self.image_paths).difference(known_ids))
+
+        if missing:
+            print(f"⚠️ {len(missing)} images listed in metadata are missing, e.g. {', '.join(missing[:5])}")
+        if orphaned:
+            print(f"⚠️ {len(orphaned)} image files have no metadata row, e.g. {', '.join(orphaned[:5])}")
+
+    def image_path(self, image_id):
+        """Return the indexed path of an image, or None if it has no file"""
+        if self.image_paths is None:
+            self.load_path_index()
+        return self.image_paths.get(image_id)
+
+    @metrics.timed('data.load_image')
     def load_image(self, image_id, img_size=(224, 224)):
-        """Load and preprocess a single image"""
-        # Try both image folders
-        img_path1 = os.path.join(self.data_dir, 'HAM10000_images_part_1', f'{image_id}.jpg')
-        img_path2 = os.path.join(self.data_dir, 'HAM10000_images_part_2', f'{image_id}.jpg')
+        """Load a single image resized to ``img_size`` as uint8 (normalization happens in the model)"""
+        return _load_image_task(self.image_path(image_id), image_id, img_size)
+
+    def _cache_paths(self, img_size):
+        """Return the (array, index) file paths of the image cache for ``img_size``"""
+        cache_dir = os.path.join(self.data_dir, 'cache')
+        name = f'images_{img_size[0]}x{img_size[1]}'
+        return os.path.join(cache_dir, f'{name}.npy'), os.path.join(cache_dir, f'{name}.json')
+
+    def build_image_cache(self, img_size=(224, 224), num_workers=None, executor='thread'):
+        """Decode every image in the metadata once into a uint8 memory-mapped array.
+
+        The array is written next to a JSON index mapping ``image_id`` to its row,
+        tagged with ``img_size`` and the mtime of every source file so that
+        ``open_image_cache`` can detect a stale cache.
+        """
+        if self.metadata is None:
+            self.load_metadata()
+
+        if self.metadata is None:
+            return None
+
+        array_path, index_path = self._cache_paths(img_size)
+        os.makedirs(os.path.dirname(array_path), exist_ok=True)
+
+        image_ids = self.metadata['image_id'].drop_duplicates().tolist()
+        print(f"🗄️ Building image cache for {len(image_ids)} images at {img_size}...")
+
+        tmp_array_path = array_path + '.tmp.npy'
+        images = np.lib.format.open_memmap(
+            tmp_array_path, mode='w+', dtype=np.uint8,
+            shape=(len(image_ids), img_size[1], img_size[0], 3)
+        )
 
-        img_path = img_path1 if os.path.exists(img_path1) else img_path2
+        rows = {}
+        sources = {}
+        decoded = self.iter_images(image_ids, img_size, num_workers=num_workers, executor=executor)
+        for image_id, image in zip(image_ids, decoded):
+            if image is None:
+                continue
+            row = len(rows)
+            images[row] = image
+            rows[image_id] = row
+            img_path = self.image_path(image_id)
+            sources[image_id] = [img_path, os.stat(img_path).st_mtime_ns]
 
-        if os.path.exists(img_path):
+            if len(rows) % 500 == 0:
+                print(f"✅ Cached {len(rows)} images...")
+
+        images.flush()
+        del images
+
+        # Drop the old index first so a half-replaced cache is treated as missing
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        os.replace(tmp_array_path, array_path)
+        with open(index_path + '.tmp', 'w') as f:
+            json.dump({'img_size': list(img_size), 'decoder': DECODER_VERSION, 'rows': rows, 'sources': sources}, f)
+        os.replace(index_path + '.tmp', index_path)
+
+        self._image_caches.pop(tuple(img_size), None)
+        print(f"🎉 Image cache written: {len(rows)} images "
+              f"({len(image_ids) - len(rows)} failed) -> {array_path}")
+        return self.open_image_cache(img_size)
+
+    def open_image_cache(self, img_size=(224, 224)):
+        """Open the image cache for ``img_size`` read-only, or return None if missing or stale"""
+        key = tuple(img_size)
+        if key in self._image_caches:
+            return self._image_caches[key]
+
+        array_path, index_path = self._cache_paths(img_size)
+        if not (os.path.exists(array_path) and os.path.exists(index_path)):
+            return None
+
+        with open(index_path) as f:
+            index = json.load(f)
+
+        if tuple(index['img_size']) != key:
+            print(f"⚠️ Image cache at {array_path} has size {index['img_size']}, ignoring it")
+            return None
+
+        if index.get('decoder') != DECODER_VERSION:
+            print("⚠️ Image cache was built with an older decoder, rebuild it with build_image_cache")
+            return None
+
+        for image_id, (img_path, mtime_ns) in index['sources'].items():
             try:
-                image = Image.open(img_path).convert('RGB')
-                image = image.resize(img_size)
-                return np.array(image) / 255.0
-            except Exception as e:
-                print(f"❌ Error loading image {image_id}: {e}")
+                stale = os.stat(img_path).st_mtime_ns != mtime_ns
+            except OSError:
+                stale = True
+            if stale:
+                print(f"⚠️ Image cache is stale ({image_id} changed), rebuild it with build_image_cache")
                 return None
+
+        images = np.load(array_path, mmap_mode='r')
+        cache = ImageCache(images, index['rows'], key)
+        self._image_caches[key] = cache
+        print(f"🗄️ Using image cache with {len(cache)} images")
+        return cache
+
+    def iter_images(self, image_ids, img_size=(224, 224), num_workers=None, executor='thread', prefetch=4,
+                    cache=None):
+        """Decode images in parallel, yielding them (or None on failure) in input order.
+
+        At most ``num_workers * prefetch`` decodes are in flight at once, so memory
+        stays bounded however many ids are requested. ``executor`` is 'thread'
+        (PIL releases the GIL while decoding and resizing) or 'process'. Images
+        found in ``cache`` (an ``ImageCache``) are read from it instead of decoded.
+        """
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+
+        def from_cache(image_id):
+            return cache.get(image_id) if cache is not None else None
+
+        if num_workers <= 1:
+            for image_id in image_ids:
+                image = from_cache(image_id)
+                if image is None:
+                    image = _load_image_task(self.image_path(image_id), image_id, img_size)
+                yield image
+            return
+
+        if executor == 'process':
+            pool_class = ProcessPoolExecutor
+        elif executor == 'thread':
+            pool_class = ThreadPoolExecutor
         else:
+            raise ValueError(f"Unknown executor '{executor}', expected 'thread' or 'process'")
+
+        max_in_flight = num_workers * max(1, prefetch)
+        pending = deque()
+        with pool_class(max_workers=num_workers) as pool:
+            try:
+                for image_id in image_ids:
+                    image = from_cache(image_id)
+                    if image is None:
+                        img_path = self.image_path(image_id)
+                        pending.append(pool.submit(_load_image_task, img_path, image_id, img_size))
+                    else:
+                        pending.append(image)
+                    if len(pending) >= max_in_flight:
+                        yield self._resolve(pending.popleft())
+
+                while pending:
+                    yield self._resolve(pending.popleft())
+            finally:
+                for item in pending:
+                    if isinstance(item, Future):
+                        item.cancel()
+
+    @staticmethod
+    def _resolve(item):
+        return item.result() if isinstance(item, Future) else item
+
+    def sample_balanced(self, max_per_class=200, strategy='undersample', seed=42, frame=None):
+        """Pick ``max_per_class`` metadata rows per class, without decoding anything.
+
+        ``frame`` defaults to the whole metadata; see ``SAMPLING_STRATEGIES``.
+        Rows are shuffled once with ``seed`` and ranked within their class, so
+        the sample is reproducible and costs O(rows) whatever the class count.
+        """
+        if strategy not in SAMPLING_STRATEGIES:
+            raise ValueError(f"Unknown sampling strategy {strategy!r}, expected one of {SAMPLING_STRATEGIES}")
+
+        if frame is None:
+            if self.metadata is None:
+                self.load_metadata()
+            frame = self.metadata
+
+        if frame is None:
             return None
 
-    def create_balanced_dataset(self, max_per_class=200, img_size=(224, 224)):
-        """Create a balanced dataset with limited samples per class"""
+        rng = np.random.default_rng(seed)
+        shuffled = frame.iloc[rng.permutation(len(frame))]
+        if strategy == 'lesion' and 'lesion_id' in shuffled.columns:
+            # The first row of each lesion after the shuffle is a random image of it
+            shuffled = shuffled.drop_duplicates('lesion_id')
+
+        rank = shuffled.groupby('dx', sort=False).cumcount().to_numpy()
+        if strategy == 'oversample':
+            # Each row is repeated max_per_class // class_size times, plus once more for
+            # the first max_per_class % class_size rows; classes that are big enough get 0 or 1
+            class_size = shuffled.groupby('dx', sort=False)['dx'].transform('size').to_numpy()
+            copies = max_per_class // class_size + (rank < max_per_class % class_size)
+            balanced_df = shuffled.iloc[np.repeat(np.arange(len(shuffled)), copies)]
+        else:
+            balanced_df = shuffled[rank < max_per_class]
+        balanced_df = balanced_df.reset_index(drop=True)
+
+        print(f"🎯 Creating balanced dataset with {len(balanced_df)} images...")
+        print("📊 Class distribution:")
+        print(balanced_df['dx'].value_counts())
+
+        return balanced_df
+
+    def _split_index_file(self, val_split, seed):
+        return os.path.join(self.data_dir, 'cache', f'split_lesion_val{round(val_split * 100)}_seed{seed}.json')
+
+    def lesion_split(self, val_split=0.2, seed=42):
+        """Return a boolean array, aligned with ``self.metadata``, marking the validation rows.
+
+        Computed on the metadata alone with ``StratifiedGroupKFold`` (one fold of
+        ``round(1 / val_split)`` held out), grouped by ``lesion_id`` so that every
+        image of a lesion lands on the same side, and stratified by ``dx``. The
+        validation image IDs are saved under ``cache/``, tagged with the mtime of
+        the metadata CSV, so later runs read them instead of recomputing.
+        """
         if self.metadata is None:
             self.load_metadata()
 
         if self.metadata is None:
-            return None, None
+            return None
 
-        # Sample balanced data
-        balanced_data = []
-        for class_name in self.metadata['dx'].unique():
-            class_data = self.metadata[self.metadata['dx'] == class_name]
-            sample_size = min(max_per_class, len(class_data))
-            sampled = class_data.sample(n=sample_size, random_state=42)
-            balanced_data.append(sampled)
+        metadata_mtime = os.stat(os.path.join(self.data_dir, 'HAM10000_metadata.csv')).st_mtime_ns
+        index_file = self._split_index_file(val_split, seed)
+        if os.path.exists(index_file):
+            with open(index_file) as f:
+                index = json.load(f)
+            if index.get('metadata_mtime_ns') == metadata_mtime and index.get('version') == SPLIT_VERSION:
+                return self.metadata['image_id'].isin(index['val_image_ids']).to_numpy()
 
-        balanced_df = pd.concat(balanced_data, ignore_index=True)
+        from sklearn.model_selection import StratifiedGroupKFold
 
-        print(f"🎯 Creating balanced dataset with {len(balanced_df)} images...")
-        print("📊 Class distribution:")
-        print(balanced_df['dx'].value_counts())
+        groups = self.metadata['lesion_id'] if 'lesion_id' in self.metadata.columns else self.metadata['image_id']
+        folds = StratifiedGroupKFold(n_splits=max(2, round(1 / val_split)), shuffle=True, random_state=seed)
+        _, val_rows = next(folds.split(self.metadata, self.metadata['dx'], groups))
+        is_val = np.zeros(len(self.metadata), dtype=bool)
+        is_val[val_rows] = True
+
+        print(f"✂️ Lesion-level split: {(~is_val).sum()} training / {is_val.sum()} validation images")
+
+        # As with the image index, a read-only data directory only costs recomputing the split next time
+        try:
+            os.makedirs(os.path.dirname(index_file), exist_ok=True)
+            with open(index_file + '.tmp', 'w') as f:
+                json.dump({'version': SPLIT_VERSION, 'metadata_mtime_ns': metadata_mtime,
+                           'val_split': val_split, 'seed': seed,
+                           'val_image_ids': self.metadata['image_id'][is_val].tolist()}, f)
+            os.replace(index_file + '.tmp', index_file)
+            print(f"💾 Split saved to {index_file}")
+        except OSError as e:
+            print(f"⚠️ Could not save the split ({e}), it will be recomputed next time")
+        return is_val
+
+    def train_val_split(self, max_per_class=200, val_split=0.2, strategy='undersample'):
+        """Return balanced ``(train_df, val_df)`` metadata frames from the lesion-level split.
+
+        No lesion has images on both sides (see ``lesion_split``), and training
+        and any later evaluation (e.g. ``export_tflite.py``) see the same
+        validation images. Each side is then sampled with ``strategy``: training
+        gets ``max_per_class * (1 - val_split)`` images per class and validation
+        the rest, never oversampled.
+        """
+        is_val = self.lesion_split(val_split)
+
+        if is_val is None:
+            return None, None
 
-        images = []
-        labels = []
+        train_per_class = int(round(max_per_class * (1 - val_split)))
+        train_df = self.sample_balanced(train_per_class, strategy, frame=self.metadata[~is_val])
+        val_df = self.sample_balanced(max_per_class - train_per_class,
+                                      'undersample' if strategy == 'oversample' else strategy,
+                                      frame=self.metadata[is_val])
+        return train_df, val_df
+
+    def load_frame(self, frame, img_size=(224, 224), num_workers=None, executor='thread', prefetch=4,
+                   use_cache=True):
+        """Decode the images of a metadata frame into ``(images, labels)``, skipping any that fail.
+
+        Images are decoded by ``iter_images``; see it for the meaning of
+        ``num_workers``, ``executor`` and ``prefetch``. With ``use_cache`` they
+        are read from the image cache when one has been built for ``img_size``.
+        """
+        # Decode straight into one preallocated uint8 array instead of a list of arrays
+        images = np.empty((len(frame), img_size[1], img_size[0], 3), dtype=np.uint8)
+        labels = np.empty(len(frame), dtype=frame['label'].dtype)
+        loaded = 0
         failed_loads = 0
 
-        for idx, row in balanced_df.iterrows():
-            image = self.load_image(row['image_id'], img_size)
+        cache = self.open_image_cache(img_size) if use_cache else None
+        decoded = self.iter_images(frame['image_id'], img_size, num_workers=num_workers,
+                                   executor=executor, prefetch=prefetch, cache=cache)
+        for image, label in zip(decoded, frame['label'].to_numpy()):
             if image is not None:
-                images.append(image)
-                labels.append(row['label'])
+                images[loaded] = image
+                labels[loaded] = label
+                loaded += 1
 
-                if len(images) % 50 == 0:
-                    print(f"✅ Loaded {len(images)} images...")
+                if loaded % 50 == 0:
+                    print(f"✅ Loaded {loaded} images...")
             else:
                 failed_loads += 1
 
         if failed_loads > 0:
             print(f"⚠️ Failed to load {failed_loads} images")
 
-        images = np.array(images)
-        labels = np.array(labels)
+        return images[:loaded], labels[:loaded]
+
+    def create_balanced_dataset(self, max_per_class=200, img_size=(224, 224), num_workers=None,
+                                executor='thread', prefetch=4, use_cache=True, strategy='undersample'):
+        """Create a balanced dataset with limited samples per class (see ``sample_balanced``
+        and ``load_frame``)"""
+        balanced_df = self.sample_balanced(max_per_class, strategy)
+
+        if balanced_df is None:
+            return None, None
+
+        images, labels = self.load_frame(balanced_df, img_size, num_workers=num_workers, executor=executor,
+                                         prefetch=prefetch, use_cache=use_cache)
 
         print(f"🎉 Dataset created: {images.shape}")
         return images, labels
+
+    def create_streaming_dataset(self, max_per_class=200, img_size=(224, 224), batch_size=16,
+                                 val_split=0.2, num_workers=None, executor='thread', prefetch=4,
+                                 use_cache=True, strategy='undersample'):
+        """Create lazily decoded, batched and prefetched ``tf.data`` train/val pipelines.
+
+        The split is made on metadata alone (see ``train_val_split``), so only
+        ``batch_size`` images plus the decode prefetch window are resident at
+        once however large the dataset.
+        Returns ``(train_ds, val_ds)`` yielding ``(image, label)`` batches.
+        """
+        train_df, val_df = self.train_val_split(max_per_class, val_split, strategy)
+
+        if train_df is None:
+            return None, None
+
+        print(f"🌊 Streaming dataset: {len(train_df)} train / {len(val_df)} validation images")
+
+        cache = self.open_image_cache(img_size) if use_cache else None
+        decode_options = dict(num_workers=num_workers, executor=executor, prefetch=prefetch, cache=cache)
+        train_ds = self._make_streaming_pipeline(train_df, img_size, batch_size, True, decode_options)
+        val_ds = self._make_streaming_pipeline(val_df, img_size, batch_size, False, decode_options)
+        return train_ds, val_ds
+
+    def _make_streaming_pipeline(self, frame, img_size, batch_size, shuffle, decode_options):
+        """Wrap ``iter_images`` over ``frame`` in a batched, prefetched ``tf.data.Dataset``"""
+        import tensorflow as tf
+
+        image_ids = frame['image_id'].to_numpy()
+        labels = frame['label'].to_numpy()
+        rng = np.random.default_rng(42)
+
+        def generator():
+            # Reshuffle the id order every epoch rather than buffering decoded images
+            order = rng.permutation(len(image_ids)) if shuffle else np.arange(len(image_ids))
+            decoded = self.iter_images(image_ids[order], img_size, **decode_options)
+            for image, label in zip(decoded, labels[order]):
+                if image is not None:
+                    yield image, label
+
+        dataset = tf.data.Dataset.from_generator(
+            generator,
+            output_signature=(
+                tf.TensorSpec(shape=(img_size[1], img_size[0], 3), dtype=tf.uint8),
+                tf.TensorSpec(shape=(), dtype=tf.int64),
+            )
+        )
+        return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pre-decode HAM10000 images into a memory-mapped cache")
+    parser.add_argument('--data-dir', default='data', help="directory holding HAM10000_metadata.csv")
+    parser.add_argument('--img-size', type=int, nargs=2, default=(224, 224), metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--num-workers', type=int, default=None, help="decode workers (default: all cores)")
+    args = parser.parse_args()
+
+    HAM10000DataLoader(args.data_dir).build_image_cache(tuple(args.img_size), num_workers=args.num_workers)
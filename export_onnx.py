@@ -0,0 +1,157 @@
+"""Export the trained classifier to ONNX and check it against the Keras model.
+
+The check fails (exit status 1, nothing written) unless the ONNX model agrees
+with the Keras model on the top class and its probabilities stay within
+``--atol``. It also compares cold start and latency of both backends.
+
+Example:
+    python export_onnx.py --data-dir data
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from data_loader import HAM10000DataLoader
+from export_tflite import median_latency_ms, validation_split
+from model import make_serving_function
+from model_registry import ModelRegistry
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Run in a fresh interpreter: construct a backend, score one image, report time and peak memory
+# (VmHWM, not ru_maxrss, which Linux carries over from the parent across exec)
+STARTUP_PROBE = """
+import json, sys, time
+sys.path.insert(0, {repo_dir!r})
+start = time.perf_counter()
+from model_registry import ModelRegistry
+{construct}
+first_prediction = model.predict_inputs(__import__('numpy').zeros((1, 224, 224, 3), dtype='uint8'))
+elapsed = time.perf_counter() - start
+with open('/proc/self/status') as f:
+    peak_kb = next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+print(json.dumps({{'startup_seconds': elapsed, 'peak_rss_mb': peak_kb / 1024}}))
+"""
+
+BACKEND_CONSTRUCTORS = {
+    'keras': "from model import SkinLesionModel\n"
+             "model = SkinLesionModel({data_dir!r}, allow_training=False, registry=ModelRegistry({models_dir!r}))",
+    'onnx': "from onnx_predictor import OnnxSkinLesionModel\n"
+            "model = OnnxSkinLesionModel(ModelRegistry({models_dir!r}))",
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export the HAM10000 classifier to ONNX")
+    parser.add_argument('--data-dir', default='data', help="directory holding HAM10000_metadata.csv and the images")
+    parser.add_argument('--models-dir', default='models', help="model registry directory to read and write")
+    parser.add_argument('--opset', type=int, default=17)
+    parser.add_argument('--atol', type=float, default=1e-4, help="largest allowed probability difference")
+    parser.add_argument('--min-agreement', type=float, default=1.0, help="smallest allowed top-1 agreement")
+    parser.add_argument('--latency-runs', type=int, default=50, help="single-image runs timed per backend")
+    parser.add_argument('--skip-startup', action='store_true', help="skip the cold start comparison")
+    parser.add_argument('--num-workers', type=int, default=None, help="image decode workers (default: all cores)")
+    return parser.parse_args(argv)
+
+
+def convert_model(model, opset=17):
+    """Convert a Keras classifier to a serialized ONNX model taking ``(N, 224, 224, 3)`` uint8 pixels"""
+    import tf2onnx
+
+    serve = make_serving_function(model)
+    model_proto, _ = tf2onnx.convert.from_function(serve, input_signature=serve.input_signature, opset=opset)
+    return model_proto.SerializeToString(), serve
+
+
+def parity_images(args, manifest):
+    """Validation images if the dataset is available, else deterministic random pixels"""
+    data_loader = HAM10000DataLoader(args.data_dir)
+    _, val_df = validation_split(data_loader, manifest)
+    if val_df is not None:
+        images, _ = data_loader.load_frame(val_df, num_workers=args.num_workers)
+        if len(images):
+            return images, 'validation split'
+
+    print("⚠️ Dataset not available, checking parity on random images")
+    return np.random.default_rng(42).integers(0, 256, (64, 224, 224, 3), dtype=np.uint8), 'random images'
+
+
+def measure_startup(backend, args):
+    """Cold start seconds and peak RSS of ``backend`` in a fresh interpreter, or None on failure"""
+    construct = BACKEND_CONSTRUCTORS[backend].format(data_dir=os.path.abspath(args.data_dir),
+                                                     models_dir=os.path.abspath(args.models_dir))
+    code = STARTUP_PROBE.format(repo_dir=REPO_DIR, construct=construct)
+    completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    if completed.returncode != 0 or not completed.stdout.strip():
+        print(f"⚠️ Could not measure {backend} startup: {completed.stderr.strip().splitlines()[-1:]}")
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    registry = ModelRegistry(args.models_dir)
+    loaded = registry.load()
+    if loaded is None:
+        print(f"❌ No model artifact in {registry.model_dir}, run train.py first")
+        return 1
+    model, class_names, manifest = loaded
+
+    import onnxruntime as ort
+
+    print(f"🔁 Converting to ONNX (opset {args.opset})...")
+    content, keras_serve = convert_model(model, args.opset)
+    session = ort.InferenceSession(content, providers=['CPUExecutionProvider'])
+    input_name = session.get_inputs()[0].name
+
+    def keras_predict(batch):
+        return keras_serve(batch).numpy()
+
+    def onnx_predict(batch):
+        return session.run(None, {input_name: batch})[0]
+
+    images, source = parity_images(args, manifest)
+    keras_probabilities = np.concatenate([keras_predict(images[i:i + 32]) for i in range(0, len(images), 32)])
+    onnx_probabilities = np.concatenate([onnx_predict(images[i:i + 32]) for i in range(0, len(images), 32)])
+
+    report = {
+        'parity_images': int(len(images)),
+        'parity_source': source,
+        'top1_agreement': float(np.mean(keras_probabilities.argmax(axis=1) == onnx_probabilities.argmax(axis=1))),
+        'max_probability_diff': float(np.abs(keras_probabilities - onnx_probabilities).max()),
+        'keras_latency_ms': median_latency_ms(keras_predict, images[0], args.latency_runs),
+        'onnx_latency_ms': median_latency_ms(onnx_predict, images[0], args.latency_runs),
+    }
+    print(f"🎯 Parity on {len(images)} images ({source}): {report['top1_agreement']:.1%} top-1 agreement, "
+          f"max probability difference {report['max_probability_diff']:.2e}")
+    print(f"⏱️ Single-image latency: Keras {report['keras_latency_ms']:.1f} ms, "
+          f"ONNX Runtime {report['onnx_latency_ms']:.1f} ms")
+
+    if report['top1_agreement'] < args.min_agreement or report['max_probability_diff'] > args.atol:
+        print(f"❌ Parity check failed (need agreement >= {args.min_agreement:.1%} and "
+              f"difference <= {args.atol:g}), ONNX model not saved")
+        return 1
+
+    registry.save_onnx(content, manifest, report)
+
+    # The ONNX probe loads the export just saved, so startup figures are added to its report afterwards
+    if not args.skip_startup:
+        for backend in ('keras', 'onnx'):
+            startup = measure_startup(backend, args)
+            if startup is not None:
+                report[f"{backend}_startup_seconds"] = startup['startup_seconds']
+                report[f"{backend}_peak_rss_mb"] = startup['peak_rss_mb']
+                print(f"🚀 {backend} cold start to first prediction: {startup['startup_seconds']:.1f}s, "
+                      f"peak RSS {startup['peak_rss_mb']:.0f} MB")
+        registry.save_onnx(content, manifest, report)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Export the trained classifier as a quantized TFLite model and compare it with the float model.
+
+Example:
+    python export_tflite.py --data-dir data --quantization int8 --calibration-samples 200
+    python serve.py --backend tflite
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from data_loader import HAM10000DataLoader
+from model import DEFAULT_TRAINING_CONFIG, make_serving_function
+from model_registry import ModelRegistry
+from tflite_backend import QUANTIZATION_MODES, TFLiteRunner, convert_model
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export the HAM10000 classifier to quantized TFLite")
+    parser.add_argument('--data-dir', default='data', help="directory holding HAM10000_metadata.csv and the images")
+    parser.add_argument('--models-dir', default='models', help="model registry directory to read and write")
+    parser.add_argument('--quantization', choices=QUANTIZATION_MODES, default='int8',
+                        help="'dynamic' quantizes weights only, 'int8' weights and activations")
+    parser.add_argument('--calibration-samples', type=int, default=200,
+                        help="training images used to calibrate int8 activation ranges")
+    parser.add_argument('--latency-runs', type=int, default=50, help="single-image runs timed per backend")
+    parser.add_argument('--num-workers', type=int, default=None, help="image decode workers (default: all cores)")
+    return parser.parse_args(argv)
+
+
+def validation_split(data_loader, manifest):
+    """``(train_df, val_df)`` sampled the way the model in ``manifest`` was trained"""
+    config = dict(DEFAULT_TRAINING_CONFIG, **(manifest.get('config') or {}))
+    return data_loader.train_val_split(config['max_per_class'], strategy=config['sampling'])
+
+
+def median_latency_ms(predict_fn, image, runs):
+    """Median wall time of ``predict_fn`` on a batch of one, after one warm-up call"""
+    batch = image[np.newaxis]
+    predict_fn(batch)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        predict_fn(batch)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def compare_models(model, runner, images, labels, latency_runs):
+    """Accuracy, agreement and single-image latency of the float model vs. the TFLite model"""
+    serve = make_serving_function(model)
+
+    def float_predict(batch):
+        return serve(batch).numpy()
+
+    float_probabilities = np.concatenate([float_predict(images[i:i + 32]) for i in range(0, len(images), 32)])
+    tflite_probabilities = np.concatenate([runner.run(images[i:i + 32]) for i in range(0, len(images), 32)])
+
+    float_classes = float_probabilities.argmax(axis=1)
+    tflite_classes = tflite_probabilities.argmax(axis=1)
+    float_accuracy = float(np.mean(float_classes == labels))
+    tflite_accuracy = float(np.mean(tflite_classes == labels))
+    return {
+        'validation_images': int(len(images)),
+        'float_accuracy': float_accuracy,
+        'tflite_accuracy': tflite_accuracy,
+        'accuracy_delta': tflite_accuracy - float_accuracy,
+        'top1_agreement': float(np.mean(float_classes == tflite_classes)),
+        'max_probability_diff': float(np.abs(float_probabilities - tflite_probabilities).max()),
+        'float_latency_ms': median_latency_ms(float_predict, images[0], latency_runs),
+        'tflite_latency_ms': median_latency_ms(runner.run, images[0], latency_runs),
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    registry = ModelRegistry(args.models_dir)
+    loaded = registry.load()
+    if loaded is None:
+        print(f"❌ No model artifact in {registry.model_dir}, run train.py first")
+        return 1
+    model, class_names, manifest = loaded
+
+    data_loader = HAM10000DataLoader(args.data_dir)
+    train_df, val_df = validation_split(data_loader, manifest)
+    if train_df is None:
+        print(f"❌ Dataset not found in {args.data_dir}; it is needed for calibration and evaluation")
+        return 1
+
+    calibration_images = None
+    if args.quantization == 'int8':
+        calibration_df = train_df.sample(n=min(args.calibration_samples, len(train_df)), random_state=42)
+        calibration_images, _ = data_loader.load_frame(calibration_df, num_workers=args.num_workers)
+        print(f"🎚️ Calibrating on {len(calibration_images)} training images")
+
+    print(f"🗜️ Converting to {args.quantization} TFLite...")
+    content = convert_model(model, args.quantization, calibration_images)
+
+    # Evaluate the converted model before it replaces any previous export
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_path = os.path.join(tmp_dir, 'model.tflite')
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+
+        images, labels = data_loader.load_frame(val_df, num_workers=args.num_workers)
+        if len(images) == 0:
+            print("❌ No validation images could be loaded")
+            return 1
+
+        report = compare_models(model, TFLiteRunner(tmp_path), images, labels, args.latency_runs)
+
+    report['keras_size_mb'] = os.path.getsize(registry.model_path) / 1e6
+    report['tflite_size_mb'] = len(content) / 1e6
+    registry.save_tflite(content, args.quantization, manifest, report)
+
+    print(f"📊 Validation accuracy on {report['validation_images']} images: "
+          f"float {report['float_accuracy']:.1%}, TFLite {report['tflite_accuracy']:.1%} "
+          f"({report['accuracy_delta'] * 100:+.1f} pts, {report['top1_agreement']:.1%} top-1 agreement)")
+    print(f"⏱️ Single-image latency: float {report['float_latency_ms']:.1f} ms, "
+          f"TFLite {report['tflite_latency_ms']:.1f} ms")
+    print(f"📦 Size: Keras {report['keras_size_mb']:.1f} MB, TFLite {report['tflite_size_mb']:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
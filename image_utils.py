@@ -0,0 +1,98 @@
+import time
+
+import numpy as np
+from PIL import Image
+
+import metrics
+
+# Spatial size the classifier expects, as (width, height)
+MODEL_INPUT_SIZE = (224, 224)
+
+# Resampling filter used everywhere an image is resized for the model
+RESAMPLE = Image.Resampling.BICUBIC
+
+# Bump whenever decode_image can produce different pixels, so caches built
+# from older decodes are rebuilt
+DECODER_VERSION = 'draft-bicubic-1'
+
+# Largest size an upload is decoded at for on-screen display
+DISPLAY_MAX_SIZE = (1024, 1024)
+
+
+def resize_to_array(image, size=MODEL_INPUT_SIZE):
+    """Resize a PIL image to a uint8 ``(height, width, 3)`` array, leaving ``image`` unchanged"""
+    with metrics.timer('image.decode'):
+        image = image.convert('RGB')
+    with metrics.timer('image.resize'):
+        if image.size != tuple(size):
+            image = image.resize(size, RESAMPLE)
+        return np.asarray(image, dtype=np.uint8)
+
+
+def decode_image(source, size=MODEL_INPUT_SIZE):
+    """Decode an image path or file object straight to a uint8 array at ``size``.
+
+    A JPEG is decoded at the smallest DCT scale (1/2, 1/4 or 1/8) that is
+    still at least ``size``, so pixels that the resize would discard are
+    never decoded. Training and inference both go through here, so the same
+    file always produces the same tensor.
+    """
+    with Image.open(source) as image:
+        # Safe here because the image was opened by this function, not passed in by the caller
+        image.draft('RGB', size)
+        return resize_to_array(image, size)
+
+
+def to_model_input(image, size=MODEL_INPUT_SIZE):
+    """Convert a PIL image to a batch-of-one uint8 model input (the model normalizes it)"""
+    return np.expand_dims(resize_to_array(image, size), axis=0)
+
+
+class UploadedImage:
+    """An uploaded file with a lazily decoded display image and a cached model input.
+
+    The model input is decoded straight from the upload at reduced scale, and
+    the display image separately at screen resolution, each only on first use.
+    Display, quality assessment, inference and report generation all read
+    from this object instead of re-opening or copying the upload.
+    """
+
+    def __init__(self, uploaded_file):
+        self.name = uploaded_file.name
+        self._file = uploaded_file
+        # Zero-copy view of the upload buffer (used for hashing and size)
+        self.data = uploaded_file.getbuffer()
+        self.size_mb = self.data.nbytes / (1024 * 1024)
+
+        # Opening only parses the header; no pixels are decoded here
+        uploaded_file.seek(0)
+        with Image.open(uploaded_file) as header:
+            self.format = header.format
+            self.width, self.height = header.size
+
+        self._image = None
+        self._model_input = None
+        self.decode_seconds = None
+
+    @property
+    def image(self):
+        """The upload decoded for display, at no more than ``DISPLAY_MAX_SIZE``"""
+        if self._image is None:
+            self._file.seek(0)
+            image = Image.open(self._file)
+            # Large phone photos only need to be decoded at screen resolution
+            image.draft('RGB', DISPLAY_MAX_SIZE)
+            image.load()
+            self._image = image
+        return self._image
+
+    def model_input(self):
+        """Return the model input tensor, decoding it on first use (timed as ``decode_seconds``)"""
+        if self._model_input is None:
+            start = time.perf_counter()
+            self._file.seek(0)
+            # A reduced-scale decode of the upload stream, exactly as the training loader does it
+            self._model_input = np.expand_dims(decode_image(self._file), axis=0)
+            self.decode_seconds = time.perf_counter() - start
+            metrics.observe('upload.decode', self.decode_seconds)
+        return self._model_input
@@ -0,0 +1,181 @@
+"""Process-wide latency histograms for the inference hot path.
+
+    with metrics.timer('model.forward'):
+        ...
+
+    @metrics.timed('report.render')
+    def generate_report_html(...):
+        ...
+
+Each name gets a fixed set of log-spaced buckets (10% wide, 1 µs to 100 s), so
+recording is a bisect and an increment, memory is constant, and p50/p95/p99
+are accurate to within one bucket. Set ``SKIN_SOLUTIONS_METRICS=0`` (or call
+``set_enabled(False)``) to turn recording off; timers then cost one flag check.
+"""
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds, in seconds, of the histogram buckets
+BUCKET_BOUNDS = [1e-6 * 1.1 ** i for i in range(194)]
+
+PERCENTILES = (50, 95, 99)
+
+_enabled = os.environ.get('SKIN_SOLUTIONS_METRICS', '1') != '0'
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+class LatencyHistogram:
+    """Bucketed latency distribution with count, sum and max"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect_left(BUCKET_BOUNDS, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the ``q``-th percentile, in seconds"""
+        with self._lock:
+            counts, count, largest = list(self.counts), self.count, self.max
+        if not count:
+            return None
+
+        rank = q / 100 * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                bound = BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else largest
+                return min(bound, largest)
+        return largest
+
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled():
+    return _enabled
+
+
+def histogram(name):
+    """Return the histogram for ``name``, creating it on first use"""
+    hist = _histograms.get(name)
+    if hist is None:
+        with _histograms_lock:
+            hist = _histograms.setdefault(name, LatencyHistogram())
+    return hist
+
+
+def observe(name, seconds):
+    """Record one ``seconds`` measurement under ``name`` (ignored when disabled)"""
+    if _enabled:
+        histogram(name).observe(seconds)
+
+
+class _Timer:
+    __slots__ = ('hist', 'start')
+
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.hist.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name):
+    """Context manager recording the time spent in its block under ``name``"""
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(histogram(name))
+
+
+def timed(name):
+    """Decorator recording every call of the wrapped function under ``name``"""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram(name).observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def snapshot():
+    """Return ``{name: {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}}`` for every recorded name"""
+    with _histograms_lock:
+        items = sorted(_histograms.items())
+
+    result = {}
+    for name, hist in items:
+        if not hist.count:
+            continue
+        stats = {'count': hist.count, 'mean_ms': hist.total / hist.count * 1000}
+        for q in PERCENTILES:
+            stats[f"p{q}_ms"] = hist.percentile(q) * 1000
+        stats['max_ms'] = hist.max * 1000
+        result[name] = stats
+    return result
+
+
+def reset():
+    with _histograms_lock:
+        _histograms.clear()
+
+
+def render_prometheus():
+    """Render every histogram as a Prometheus summary in the text exposition format"""
+    lines = [
+        "# HELP skin_solutions_latency_seconds Latency of instrumented pipeline stages.",
+        "# TYPE skin_solutions_latency_seconds summary",
+    ]
+    with _histograms_lock:
+        items = sorted(_histograms.items())
+
+    for name, hist in items:
+        if not hist.count:
+            continue
+        for q in PERCENTILES:
+            lines.append(f'skin_solutions_latency_seconds{{stage="{name}",quantile="{q / 100}"}} '
+                         f'{hist.percentile(q):.6g}')
+        lines.append(f'skin_solutions_latency_seconds_sum{{stage="{name}"}} {hist.total:.6g}')
+        lines.append(f'skin_solutions_latency_seconds_count{{stage="{name}"}} {hist.count}')
+    return "\n".join(lines) + "\n"
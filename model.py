@@ -3,25 +3,101 @@ from tensorflow import keras
 import numpy as np
 from PIL import Image
 import os
-import streamlit as st
+import hashlib
 from data_loader import HAM10000DataLoader
-from sklearn.model_selection import train_test_split
+from model_registry import ModelRegistry
+from image_utils import DECODER_VERSION
+from base_predictor import BasePredictor
 
+# Training settings used when a model is trained implicitly at construction time
+DEFAULT_TRAINING_CONFIG = {
+    'streaming': False,
+    'max_per_class': 100,
+    'epochs': 5,
+    'batch_size': 16,
+    'cached_features': False,
+    'sampling': 'undersample',
+}
 
-class SkinLesionModel:
-    def __init__(self, data_dir=None, use_real_data=True):
-        self.model = None
-        self.class_names = []
-        self.data_loader = None
+
+def make_serving_function(model):
+    """Wrap a Keras classifier in a ``tf.function`` taking a ``(N, 224, 224, 3)`` uint8 batch.
+
+    The batch dimension is left open, so any batch size reuses the same
+    trace; the function is traced once here so the first real call is fast.
+    """
+    @tf.function(input_signature=[tf.TensorSpec(shape=(None, 224, 224, 3), dtype=tf.uint8, name='images')])
+    def serve(images):
+        return model(tf.cast(images, tf.float32), training=False)
+
+    serve(tf.zeros((1, 224, 224, 3), dtype=tf.uint8))
+    return serve
+
+
+class SkinLesionModel(BasePredictor):
+    def __init__(self, data_dir=None, use_real_data=True, retrain=False, registry=None, allow_training=True,
+                 backend='keras'):
+        """Load (or, if allowed, train) the classifier.
+
+        With ``allow_training=False`` nothing is ever trained here: the saved
+        artifact is loaded even if it is out of date, falling back to the demo
+        model. Serving processes use this and leave training to ``train.py``.
+
+        ``backend='tflite'`` serves the quantized model written by
+        ``export_tflite.py`` instead of the Keras model, if it is up to date.
+        """
+        self._init_state(registry)
+
+        if backend == 'tflite':
+            if self.load_tflite_model():
+                return
+            print("⚠️ No usable TFLite model, serving the Keras model instead")
+        elif backend != 'keras':
+            raise ValueError(f"Unknown backend {backend!r}, expected 'keras' or 'tflite'")
 
         if use_real_data and data_dir and os.path.exists(os.path.join(data_dir, 'HAM10000_metadata.csv')):
             print("🎯 Using real HAM10000 dataset!")
             self.data_loader = HAM10000DataLoader(data_dir)
-            self.train_with_real_data()
+
+            # Only retrain when asked to or when the config/dataset changed since the saved artifact.
+            # Without training allowed, any artifact (e.g. one from train.py with custom settings) is used.
+            fingerprint = ModelRegistry.fingerprint(DEFAULT_TRAINING_CONFIG, data_dir) if allow_training else None
+            loaded = None if retrain else self.registry.load(fingerprint)
+            if loaded is not None:
+                self.model, self.class_names, manifest = loaded
+                self.model_version = self._manifest_version(manifest)
+            elif allow_training:
+                self.train_with_real_data(**DEFAULT_TRAINING_CONFIG)
+            else:
+                print("⚠️ No model artifact found, run train.py to train one")
+                self.load_demo_model()
         else:
             print("⚠️ HAM10000 dataset not found, using transfer learning demo")
             self.load_demo_model()
 
+        # Trace and warm up the serving function now rather than on the first request
+        self.serving_function()
+
+    def _init_state(self, registry=None):
+        self.model = None
+        # Identifies the weights behind predictions, e.g. to key prediction caches
+        self.model_version = None
+        self.class_names = []
+        self.data_loader = None
+        self.registry = registry if registry is not None else ModelRegistry()
+        self._serving_fn = None
+        self._serving_model = None
+        # Set when serving a TFLite export instead of self.model
+        self._tflite = None
+
+    @classmethod
+    def for_training(cls, data_dir, registry=None):
+        """Create an empty instance bound to ``data_dir`` that neither loads nor trains a model yet"""
+        instance = cls.__new__(cls)
+        instance._init_state(registry)
+        instance.data_loader = HAM10000DataLoader(data_dir)
+        return instance
+
     def create_model(self, num_classes):
         """Create model with transfer learning"""
         # Use MobileNetV2 as base
@@ -34,7 +110,11 @@ class SkinLesionModel:
         # Freeze base model initially
         base_model.trainable = False
 
+        # Inputs are raw uint8 pixels; scaling to [0, 1] happens once, inside the
+        # graph, so training and inference always share the same normalization
         model = tf.keras.Sequential([
+            tf.keras.Input(shape=(224, 224, 3)),
+            tf.keras.layers.Rescaling(1.0 / 255),
             base_model,
             tf.keras.layers.GlobalAveragePooling2D(),
             tf.keras.layers.Dropout(0.2),
@@ -51,65 +131,224 @@ class SkinLesionModel:
 
         return model
 
-    def train_with_real_data(self):
-        """Train model on real HAM10000 data"""
+    def split_backbone_and_head(self):
+        """Split ``self.model`` into a frozen feature extractor and its trainable head.
+
+        Both returned models share layers (and therefore weights) with
+        ``self.model``, so training the head trains the full classifier.
+        """
+        layers = self.model.layers
+        pool_index = next(i for i, layer in enumerate(layers)
+                          if isinstance(layer, tf.keras.layers.GlobalAveragePooling2D))
+
+        backbone = tf.keras.Sequential([tf.keras.Input(shape=(224, 224, 3))] + layers[:pool_index + 1])
+        feature_dim = backbone.output_shape[-1]
+        head = tf.keras.Sequential([tf.keras.Input(shape=(feature_dim,))] + layers[pool_index + 1:])
+        head.compile(
+            optimizer=tf.keras.optimizers.Adam(learning_rate=0.0001),
+            loss='categorical_crossentropy',
+            metrics=['accuracy']
+        )
+        return backbone, head
+
+    def extract_features(self, backbone, image_ids, batch_size=32, num_workers=None):
+        """Return ``(image_ids, features)`` of pooled backbone embeddings for the images that load.
+
+        Embeddings are cached on disk under the data directory, tagged with a
+        checksum of the backbone weights, so each image only ever goes through
+        the frozen backbone once. The tag also covers the image decoder version.
+        """
+        cache_path = os.path.join(self.data_loader.data_dir, 'cache', 'features_mobilenetv2_224x224.npz')
+        digest = hashlib.sha1(DECODER_VERSION.encode())
+        for weight in backbone.weights:
+            digest.update(weight.numpy().tobytes())
+        backbone_tag = digest.hexdigest()
+
+        cached = {}
+        if os.path.exists(cache_path):
+            with np.load(cache_path) as stored:
+                if str(stored['backbone_tag']) == backbone_tag:
+                    cached = dict(zip(stored['image_ids'].tolist(), stored['features']))
+
+        # Images with no file on disk are skipped up front instead of retried every run
+        missing = [image_id for image_id in dict.fromkeys(image_ids)
+                   if image_id not in cached and self.data_loader.image_path(image_id) is not None]
+        if missing:
+            print(f"🧠 Extracting backbone features for {len(missing)} images "
+                  f"({len(cached)} already cached)...")
+            image_cache = self.data_loader.open_image_cache()
+            decoded = self.data_loader.iter_images(missing, num_workers=num_workers, cache=image_cache)
+
+            batch_ids, batch_images = [], []
+            num_cached = len(cached)
+            for image_id, image in zip(missing, decoded):
+                if image is not None:
+                    batch_ids.append(image_id)
+                    batch_images.append(image)
+                if batch_images and (len(batch_images) == batch_size or image_id == missing[-1]):
+                    features = backbone.predict_on_batch(np.stack(batch_images))
+                    cached.update(zip(batch_ids, np.asarray(features, dtype=np.float32)))
+                    batch_ids, batch_images = [], []
+
+        if missing and len(cached) > num_cached:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            ids = list(cached)
+            np.savez(cache_path + '.tmp.npz', image_ids=np.array(ids), backbone_tag=backbone_tag,
+                     features=np.stack([cached[image_id] for image_id in ids]))
+            os.replace(cache_path + '.tmp.npz', cache_path)
+            print(f"💾 Feature cache saved: {len(ids)} images")
+
+        loaded_ids = [image_id for image_id in image_ids if image_id in cached]
+        if not loaded_ids:
+            return loaded_ids, np.empty((0, backbone.output_shape[-1]), dtype=np.float32)
+        return loaded_ids, np.stack([cached[image_id] for image_id in loaded_ids])
+
+    def train_with_real_data(self, streaming=False, max_per_class=100, epochs=5, batch_size=16,
+                             cached_features=False, num_workers=None, sampling='undersample'):
+        """Train model on real HAM10000 data.
+
+        With ``streaming=True`` images are decoded lazily through a ``tf.data``
+        pipeline instead of being materialized in RAM, so ``max_per_class``
+        can be raised to the full dataset. With ``cached_features=True`` the
+        frozen backbone runs once per image (see ``extract_features``) and only
+        the head is trained, on the cached embeddings. ``sampling`` is one of
+        ``data_loader.SAMPLING_STRATEGIES``. Every mode uses the cached
+        lesion-level split of the metadata and decodes only the images it selects.
+        """
         print("🚀 Starting training with real HAM10000 data...")
 
-        # Load balanced dataset (smaller for demo)
-        images, labels = self.data_loader.create_balanced_dataset(max_per_class=100)
+        if cached_features:
+            train_df, val_df = self.data_loader.train_val_split(max_per_class, strategy=sampling)
+            if train_df is None:
+                print("❌ Failed to load dataset, falling back to demo mode")
+                self.load_demo_model()
+                return
 
-        if images is None:
-            print("❌ Failed to load dataset, falling back to demo mode")
-            self.load_demo_model()
-            return
+            self.class_names = self.data_loader.class_names
+            num_classes = len(self.class_names)
+            self.model = self.create_model(num_classes)
+            backbone, head = self.split_backbone_and_head()
 
-        self.class_names = self.data_loader.class_names
+            def features_and_labels(frame):
+                image_ids, features = self.extract_features(backbone, frame['image_id'].tolist(),
+                                                            num_workers=num_workers)
+                label_of = dict(zip(frame['image_id'], frame['label']))
+                return features, np.array([label_of[image_id] for image_id in image_ids])
 
-        # Split data
-        X_train, X_val, y_train, y_val = train_test_split(
-            images, labels, test_size=0.2, random_state=42, stratify=labels
-        )
+            X_train, y_train = features_and_labels(train_df)
+            X_val, y_val = features_and_labels(val_df)
+            y_train_cat = keras.utils.to_categorical(y_train, num_classes)
+            y_val_cat = keras.utils.to_categorical(y_val, num_classes)
 
-        # Convert to categorical
-        num_classes = len(self.class_names)
-        y_train_cat = keras.utils.to_categorical(y_train, num_classes)
-        y_val_cat = keras.utils.to_categorical(y_val, num_classes)
-
-        # Create and train model
-        self.model = self.create_model(num_classes)
-
-        print("🏋️ Training model...")
-        history = self.model.fit(
-            X_train, y_train_cat,
-            validation_data=(X_val, y_val_cat),
-            epochs=5,  # Keep it reasonable for demo
-            batch_size=16,
-            verbose=1
-        )
+            print("🏋️ Training classifier head on cached features...")
+            history = head.fit(
+                X_train, y_train_cat,
+                validation_data=(X_val, y_val_cat),
+                epochs=epochs,
+                batch_size=batch_size,
+                verbose=1
+            )
+        elif streaming:
+            train_ds, val_ds = self.data_loader.create_streaming_dataset(
+                max_per_class=max_per_class, batch_size=batch_size, num_workers=num_workers, strategy=sampling
+            )
+            if train_ds is None:
+                print("❌ Failed to load dataset, falling back to demo mode")
+                self.load_demo_model()
+                return
+
+            self.class_names = self.data_loader.class_names
+            num_classes = len(self.class_names)
+
+            def to_categorical(images, labels):
+                return images, tf.one_hot(labels, num_classes)
+
+            train_ds = train_ds.map(to_categorical)
+            val_ds = val_ds.map(to_categorical)
+
+            self.model = self.create_model(num_classes)
+
+            print("🏋️ Training model (streaming)...")
+            history = self.model.fit(
+                train_ds,
+                validation_data=val_ds,
+                epochs=epochs,
+                verbose=1
+            )
+        else:
+            # Split the metadata, then decode each side (smaller for demo)
+            train_df, val_df = self.data_loader.train_val_split(max_per_class, strategy=sampling)
+
+            if train_df is None:
+                print("❌ Failed to load dataset, falling back to demo mode")
+                self.load_demo_model()
+                return
+
+            self.class_names = self.data_loader.class_names
+            X_train, y_train = self.data_loader.load_frame(train_df, num_workers=num_workers)
+            X_val, y_val = self.data_loader.load_frame(val_df, num_workers=num_workers)
+
+            # Convert to categorical
+            num_classes = len(self.class_names)
+            y_train_cat = keras.utils.to_categorical(y_train, num_classes)
+            y_val_cat = keras.utils.to_categorical(y_val, num_classes)
+
+            # Create and train model
+            self.model = self.create_model(num_classes)
+
+            print("🏋️ Training model...")
+            history = self.model.fit(
+                X_train, y_train_cat,
+                validation_data=(X_val, y_val_cat),
+                epochs=epochs,  # Keep it reasonable for demo
+                batch_size=batch_size,
+                verbose=1
+            )
 
         # Save model
-        self.model.save('ham10000_trained_model.h5')
+        config = {
+            'streaming': streaming,
+            'max_per_class': max_per_class,
+            'epochs': epochs,
+            'batch_size': batch_size,
+            'cached_features': cached_features,
+            'sampling': sampling,
+        }
+        fingerprint = ModelRegistry.fingerprint(config, self.data_loader.data_dir)
+        manifest = self.registry.save(self.model, self.class_names, fingerprint, config)
+        self.model_version = self._manifest_version(manifest)
         print("💾 Model saved!")
 
-        # Save class names
-        import pickle
-        with open('class_names.pkl', 'wb') as f:
-            pickle.dump(self.class_names, f)
-
         return history
 
     def load_demo_model(self):
         """Load demo model if real data not available"""
         # Try to load saved model first
+        loaded = self.registry.load()
+        if loaded is not None:
+            self.model, self.class_names, manifest = loaded
+            self.model_version = self._manifest_version(manifest)
+            return
+
+        # Artifact written before the model registry existed
         if os.path.exists('ham10000_trained_model.h5'):
             try:
                 self.model = keras.models.load_model('ham10000_trained_model.h5')
 
+                # Models saved before normalization moved into the graph expect [0, 1] inputs
+                if not any(isinstance(layer, keras.layers.Rescaling) for layer in self.model.layers):
+                    self.model = tf.keras.Sequential([
+                        tf.keras.Input(shape=(224, 224, 3)),
+                        tf.keras.layers.Rescaling(1.0 / 255),
+                        self.model
+                    ])
+
                 # Load class names
                 import pickle
                 with open('class_names.pkl', 'rb') as f:
                     self.class_names = pickle.load(f)
 
+                self.model_version = f"legacy-h5@{os.path.getmtime('ham10000_trained_model.h5'):.0f}"
                 print("✅ Loaded saved HAM10000 model!")
                 return
             except:
@@ -118,28 +357,46 @@ class SkinLesionModel:
         # Create demo model
         self.class_names = ['akiec', 'bcc', 'bkl', 'df', 'mel', 'nv', 'vasc']
         self.model = self.create_model(len(self.class_names))
+        # The demo head is randomly initialized, so every instance is its own version
+        self.model_version = f"demo-{os.urandom(4).hex()}"
         print("📝 Created demo model")
 
-    def preprocess_image(self, image):
-        """Preprocess image for prediction"""
-        image = image.resize((224, 224))
-        img_array = np.array(image).astype('float32') / 255.0
-        img_array = np.expand_dims(img_array, axis=0)
-        return img_array
-
-    def predict(self, image):
-        """Make prediction"""
-        try:
-            processed_image = self.preprocess_image(image)
-            predictions = self.model.predict(processed_image, verbose=0)
-
-            result = {}
-            for i, class_name in enumerate(self.class_names):
-                result[class_name] = float(predictions[0][i])
-
-            return result
-
-        except Exception as e:
-            print(f"❌ Error: {e}")
-            # Return dummy predictions
-            return {class_name: 1.0 / len(self.class_names) for class_name in self.class_names}
+    def load_tflite_model(self):
+        """Serve the registry's TFLite export; returns False if there is no up-to-date one"""
+        manifest = self.registry.read_tflite_manifest()
+        if manifest is None:
+            return False
+
+        from tflite_backend import TFLiteRunner
+
+        self._tflite = TFLiteRunner(self.registry.tflite_path)
+        self.class_names = manifest['class_names']
+        # Quantized predictions differ slightly from the float model's, so they are versioned apart
+        source_version = self._manifest_version({'fingerprint': manifest['source_fingerprint'],
+                                                 'created': manifest['source_created']})
+        self.model_version = f"{source_version}+tflite-{manifest['quantization']}"
+        print(f"✅ Loaded {manifest['quantization']} TFLite model ({self._tflite.size_bytes / 1e6:.1f} MB)")
+        return True
+
+    @staticmethod
+    def _manifest_version(manifest):
+        return f"{manifest['fingerprint'][:12]}@{manifest['created']}"
+
+    def serving_function(self):
+        """Return a traced ``tf.function`` running ``self.model`` on a uint8 batch.
+
+        Calling it directly skips the data adapter and predict loop that
+        ``keras.Model.predict`` sets up on every call. The batch dimension is
+        left open, so any batch size reuses the same trace.
+        """
+        if self._serving_fn is None or self._serving_model is not self.model:
+            self._serving_fn = make_serving_function(self.model)
+            self._serving_model = self.model
+
+        return self._serving_fn
+
+    def _run_model(self, inputs):
+        """Return the class probabilities for a uint8 input batch from the active backend"""
+        if self._tflite is not None:
+            return self._tflite.run(inputs)
+        return self.serving_function()(inputs).numpy()
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+
+class ModelRegistry:
+    """Stores trained models together with their class names and a training fingerprint"""
+
+    def __init__(self, root='models', name='ham10000'):
+        self.model_dir = os.path.join(root, name)
+        self.model_path = os.path.join(self.model_dir, 'model.keras')
+        self.manifest_path = os.path.join(self.model_dir, 'manifest.json')
+        self.tflite_path = os.path.join(self.model_dir, 'model.tflite')
+        self.tflite_manifest_path = os.path.join(self.model_dir, 'tflite.json')
+        self.onnx_path = os.path.join(self.model_dir, 'model.onnx')
+        self.onnx_manifest_path = os.path.join(self.model_dir, 'onnx.json')
+
+    @staticmethod
+    def fingerprint(config, data_dir):
+        """Hash the training config with the state of the dataset it was trained on.
+
+        Only the metadata CSV and the image folders are stat'ed, so this costs
+        a handful of syscalls however many images there are. The image decoder
+        and train/validation split versions are included, since either changes
+        what the model is trained on.
+        """
+        # Imported here so that loading a model does not pull in pandas
+        from data_loader import SPLIT_VERSION
+        from image_utils import DECODER_VERSION
+
+        state = {'config': config, 'decoder': DECODER_VERSION, 'split': SPLIT_VERSION, 'files': {}}
+        for name in ('HAM10000_metadata.csv', 'HAM10000_images_part_1', 'HAM10000_images_part_2'):
+            path = os.path.join(data_dir, name)
+            if os.path.exists(path):
+                stat = os.stat(path)
+                state['files'][name] = [stat.st_size, stat.st_mtime_ns]
+
+        encoded = json.dumps(state, sort_keys=True).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def read_manifest(self):
+        """Return the manifest of the stored model, or None if there is none"""
+        if not (os.path.exists(self.manifest_path) and os.path.exists(self.model_path)):
+            return None
+
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def save(self, model, class_names, fingerprint, config):
+        """Store ``model`` and its manifest, replacing any previous artifact"""
+        os.makedirs(self.model_dir, exist_ok=True)
+
+        # Drop the old manifest first so a half-written artifact is never loaded
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+
+        tmp_model_path = os.path.join(self.model_dir, 'model.tmp.keras')
+        model.save(tmp_model_path)
+        os.replace(tmp_model_path, self.model_path)
+
+        manifest = {
+            'class_names': list(class_names),
+            'fingerprint': fingerprint,
+            'config': config,
+            'created': datetime.now().isoformat(timespec='seconds'),
+        }
+        with open(self.manifest_path + '.tmp', 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(self.manifest_path + '.tmp', self.manifest_path)
+
+        print(f"💾 Model artifact saved to {self.model_dir}")
+        return manifest
+
+    def load(self, fingerprint=None):
+        """Load the stored model as ``(model, class_names, manifest)``.
+
+        Returns None if there is no artifact, or if ``fingerprint`` is given
+        and does not match the one the artifact was trained with.
+        """
+        manifest = self.read_manifest()
+        if manifest is None:
+            return None
+
+        if fingerprint is not None and manifest['fingerprint'] != fingerprint:
+            print("⚠️ Saved model was trained on a different config or dataset")
+            return None
+
+        from tensorflow import keras
+
+        # Serving never needs the optimizer state, and skipping it is most of the load time
+        model = keras.models.load_model(self.model_path, compile=False)
+        print(f"✅ Loaded model artifact from {self.model_dir} ({manifest['created']})")
+        return model, manifest['class_names'], manifest
+
+    def save_tflite(self, content, quantization, source_manifest, report=None):
+        """Store a TFLite export of the model described by ``source_manifest``"""
+        return self._save_export(self.tflite_path, self.tflite_manifest_path, content, source_manifest,
+                                 {'quantization': quantization, 'report': report or {}})
+
+    def read_tflite_manifest(self):
+        """Return the manifest of the TFLite export, or None if there is none or it is stale"""
+        return self._read_export_manifest(self.tflite_path, self.tflite_manifest_path, 'export_tflite.py')
+
+    def save_onnx(self, content, source_manifest, report=None):
+        """Store an ONNX export of the model described by ``source_manifest``"""
+        return self._save_export(self.onnx_path, self.onnx_manifest_path, content, source_manifest,
+                                 {'report': report or {}})
+
+    def read_onnx_manifest(self):
+        """Return the manifest of the ONNX export, or None if there is none or it is stale"""
+        return self._read_export_manifest(self.onnx_path, self.onnx_manifest_path, 'export_onnx.py')
+
+    def _save_export(self, path, manifest_path, content, source_manifest, extra):
+        os.makedirs(self.model_dir, exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(content)
+        os.replace(path + '.tmp', path)
+
+        manifest = {
+            'class_names': list(source_manifest['class_names']),
+            'source_fingerprint': source_manifest['fingerprint'],
+            'source_created': source_manifest['created'],
+            'created': datetime.now().isoformat(timespec='seconds'),
+            **extra,
+        }
+        with open(manifest_path + '.tmp', 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(manifest_path + '.tmp', manifest_path)
+
+        print(f"💾 Exported model saved to {path}")
+        return manifest
+
+    def _read_export_manifest(self, path, manifest_path, export_script):
+        """Load an export's manifest; an export of an older Keras artifact is reported and ignored"""
+        if not (os.path.exists(manifest_path) and os.path.exists(path)):
+            return None
+
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+        source = self.read_manifest()
+        if source is not None and (source['fingerprint'], source['created']) != \
+                (manifest['source_fingerprint'], manifest['source_created']):
+            print(f"⚠️ {os.path.basename(path)} was exported from an older model artifact, "
+                  f"run {export_script} again")
+            return None
+        return manifest
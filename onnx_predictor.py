@@ -0,0 +1,49 @@
+"""Classifier backed by an ONNX export, served with ONNX Runtime and without TensorFlow.
+
+Nothing imported here pulls in TensorFlow, so a web tier using this class
+starts in a fraction of the time and memory of ``SkinLesionModel``.
+"""
+import os
+
+import numpy as np
+
+from base_predictor import BasePredictor
+from model_registry import ModelRegistry
+
+
+class OnnxSkinLesionModel(BasePredictor):
+    """Drop-in replacement for ``SkinLesionModel`` serving ``models/ham10000/model.onnx``.
+
+    Offers the same ``predict``/``predict_input``/``predict_inputs``/
+    ``predict_batch`` methods and ``class_names``/``model_version``
+    attributes. The export is written by ``export_onnx.py``.
+    """
+
+    def __init__(self, registry=None, num_threads=None):
+        import onnxruntime as ort
+
+        self.registry = registry if registry is not None else ModelRegistry()
+        manifest = self.registry.read_onnx_manifest()
+        if manifest is None:
+            raise FileNotFoundError(f"No up-to-date ONNX model in {self.registry.model_dir}, run export_onnx.py")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or os.cpu_count()
+        self._session = ort.InferenceSession(self.registry.onnx_path, sess_options=options,
+                                             providers=['CPUExecutionProvider'])
+        self._input_name = self._session.get_inputs()[0].name
+
+        self.class_names = manifest['class_names']
+        # Same weights as the Keras artifact, but versioned apart since float results can differ slightly
+        self.model_version = f"{manifest['source_fingerprint'][:12]}@{manifest['source_created']}+onnx"
+        print(f"✅ Loaded ONNX model from {self.registry.onnx_path}")
+
+    @staticmethod
+    def available(registry=None):
+        """Whether an up-to-date ONNX export exists in ``registry``"""
+        registry = registry if registry is not None else ModelRegistry()
+        return registry.read_onnx_manifest() is not None
+
+    def _run_model(self, inputs):
+        # InferenceSession.run is thread-safe, so concurrent sessions need no lock
+        return self._session.run(None, {self._input_name: np.asarray(inputs, dtype=np.uint8)})[0]
@@ -0,0 +1,61 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """Bounded LRU cache of predictions keyed by image content and model version.
+
+    Thread-safe, so one instance can be shared by every Streamlit session in a
+    process. Keys hash the raw upload bytes, so the same photo re-uploaded under
+    another name (or re-analyzed on a rerun) is a hit.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(image_bytes, model_version):
+        """Return the cache key for an image's raw bytes scored by ``model_version``"""
+        digest = hashlib.blake2b(image_bytes, digest_size=20).hexdigest()
+        return f"{model_version}:{digest}"
+
+    def get(self, key):
+        """Return a copy of the cached result for ``key``, or None on a miss"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+
+    def put(self, key, result):
+        """Store ``result`` under ``key``, evicting the least recently used entry if full"""
+        with self._lock:
+            self._entries[key] = dict(result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return size and hit/miss counters as a dict"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
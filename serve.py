@@ -0,0 +1,230 @@
+"""Standalone HTTP inference service for the skin lesion classifier.
+
+Concurrent requests are collected into dynamic micro-batches so that one
+model call scores many images.
+
+    python serve.py --port 8080 --max-batch-size 16 --max-wait-ms 5
+    curl --data-binary @lesion.jpg -H "Content-Type: image/jpeg" http://localhost:8080/predict
+
+With ``--workers N`` the model runs in N separate processes instead (see
+worker_pool.py), so scoring scales past one process.
+"""
+import argparse
+import io
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import metrics
+from image_utils import decode_image
+
+# Largest request body accepted, matching the upload limit of the web app
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+
+
+class MicroBatcher:
+    """Collects concurrently submitted model inputs into batches for one scoring call.
+
+    A batch is dispatched as soon as it holds ``max_batch_size`` inputs, or
+    ``max_wait_ms`` after its first input arrived, whichever comes first.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, model_input):
+        """Queue one ``(224, 224, 3)`` uint8 input; returns a Future of its result dict"""
+        future = Future()
+        self._queue.put((model_input, future))
+        return future
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+        }
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            stopping = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._process(batch)
+            if stopping:
+                return
+
+    def _process(self, batch):
+        futures = [future for _, future in batch]
+        try:
+            results = self.predict_fn(np.stack([model_input for model_input, _ in batch]))
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.items += len(batch)
+        for future, result in zip(futures, results):
+            future.set_result(result)
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    # Set by make_server
+    model = None
+    batcher = None
+    request_timeout = 30.0
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok', 'model_version': self.model.model_version})
+        elif self.path == '/stats':
+            self._send_json(200, self.batcher.stats())
+        elif self.path == '/metrics':
+            self._send_text(200, metrics.render_prometheus())
+        else:
+            self._send_json(404, {'error': f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        with metrics.timer('http.predict'):
+            self._handle_post()
+
+    def _handle_post(self):
+        if self.path != '/predict':
+            self._send_json(404, {'error': f"Unknown path {self.path}"})
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length <= 0:
+            self._send_json(400, {'error': "Request body must be the raw image bytes"})
+            return
+        if length > MAX_UPLOAD_BYTES:
+            self._send_json(413, {'error': f"Image larger than {MAX_UPLOAD_BYTES} bytes"})
+            return
+
+        # Decode on this request's thread; only the model call is batched
+        try:
+            model_input = decode_image(io.BytesIO(self.rfile.read(length)))
+        except Exception as e:
+            self._send_json(400, {'error': f"Could not decode image: {e}"})
+            return
+
+        try:
+            predictions = self.batcher.submit(model_input).result(timeout=self.request_timeout)
+        except Exception as e:
+            self._send_json(500, {'error': f"Prediction failed: {e}"})
+            return
+
+        self._send_json(200, {'predictions': predictions, 'model_version': self.model.model_version})
+
+    def _send_json(self, status, payload):
+        self._send_body(status, json.dumps(payload).encode('utf-8'), 'application/json')
+
+    def _send_text(self, status, text):
+        self._send_body(status, text.encode('utf-8'), 'text/plain; version=0.0.4')
+
+    def _send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Per-request access logs would dominate the console under load
+        pass
+
+
+def make_server(model, host='127.0.0.1', port=8080, max_batch_size=16, max_wait_ms=5.0, workers=0):
+    """Return ``(server, batcher)`` serving ``model`` (a loaded ``SkinLesionModel``).
+
+    With ``workers`` > 0, ``batcher`` is an ``InferenceWorkerPool`` scoring
+    requests on that many processes rather than an in-process ``MicroBatcher``.
+    """
+    if workers > 0:
+        from worker_pool import InferenceWorkerPool
+        batcher = InferenceWorkerPool(model, num_workers=workers, max_batch_size=max_batch_size,
+                                      max_wait_ms=max_wait_ms)
+    else:
+        batcher = MicroBatcher(model.predict_inputs, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    handler = type('BoundInferenceRequestHandler', (InferenceRequestHandler,),
+                   {'model': model, 'batcher': batcher})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, batcher
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve skin lesion predictions over HTTP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch-size', type=int, default=16)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help="how long a batch waits for more requests after its first one")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="number of inference worker processes (0 scores in the server process)")
+    parser.add_argument('--backend', choices=('keras', 'tflite', 'onnx'), default='keras',
+                        help="'tflite' serves the quantized export written by export_tflite.py, "
+                             "'onnx' the export written by export_onnx.py (without TensorFlow)")
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--models-dir', default='models', help="model registry directory to load from")
+    args = parser.parse_args(argv)
+
+    from model_registry import ModelRegistry
+
+    if args.backend == 'onnx':
+        from onnx_predictor import OnnxSkinLesionModel
+        model = OnnxSkinLesionModel(ModelRegistry(args.models_dir))
+    else:
+        from model import SkinLesionModel
+        model = SkinLesionModel(args.data_dir, use_real_data=True, allow_training=False,
+                                registry=ModelRegistry(args.models_dir), backend=args.backend)
+    server, batcher = make_server(model, args.host, args.port, args.max_batch_size, args.max_wait_ms,
+                                  args.workers)
+    print(f"🌐 Serving on http://{args.host}:{args.port} (POST /predict, GET /health, GET /stats, GET /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import time
+from contextlib import contextmanager
+
+# Seconds the web UI may spend importing modules before its first render
+IMPORT_BUDGET_SECONDS = 2.0
+
+# Stage name -> seconds. Lives at module level so it survives Streamlit reruns,
+# which re-execute app.py but reuse already-imported modules.
+_timings = {}
+
+
+@contextmanager
+def timed_stage(name):
+    """Record how long the wrapped block takes, the first time ``name`` runs in this process"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if name not in _timings:
+            _timings[name] = time.perf_counter() - start
+
+
+def startup_timings():
+    """Return the recorded ``{stage: seconds}`` breakdown, in the order stages first ran"""
+    return dict(_timings)
+
+
+def import_time_total():
+    """Return the total seconds spent in stages whose name starts with 'import'"""
+    return sum(seconds for name, seconds in _timings.items() if name.startswith('import'))
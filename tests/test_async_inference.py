@@ -0,0 +1,123 @@
+import asyncio
+import threading
+
+import pytest
+
+from async_inference import AsyncInferenceFrontend, DeadlineExceededError, OverloadedError
+
+
+class GatedPredictor:
+    """Stub ``predict_fn`` that records what it scores and blocks until the gate opens"""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.seen = []
+
+    def __call__(self, item):
+        self.seen.append(item)
+        if item == 'bad':
+            raise ValueError("cannot score this")
+        self.gate.wait(timeout=5)
+        return {'item': item}
+
+
+def run(scenario, max_queue_size=1):
+    """Run ``scenario(frontend, predictor)`` on a fresh event loop with a single worker"""
+    predictor = GatedPredictor()
+    frontend = AsyncInferenceFrontend(predictor, max_queue_size=max_queue_size, num_workers=1)
+    try:
+        asyncio.run(scenario(frontend, predictor))
+    finally:
+        predictor.gate.set()
+    return frontend, predictor
+
+
+async def occupy_worker(frontend, predictor):
+    """Submit a request and wait until the worker is blocked scoring it"""
+    busy = asyncio.ensure_future(frontend.predict('busy'))
+    while 'busy' not in predictor.seen:
+        await asyncio.sleep(0.005)
+    return busy
+
+
+def test_full_queue_fails_fast():
+    async def scenario(frontend, predictor):
+        busy = await occupy_worker(frontend, predictor)
+        queued = asyncio.ensure_future(frontend.predict('queued'))
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(OverloadedError):
+            await frontend.predict('rejected')
+
+        predictor.gate.set()
+        assert await busy == {'item': 'busy'}
+        assert await queued == {'item': 'queued'}
+
+    frontend, predictor = run(scenario)
+    assert predictor.seen == ['busy', 'queued']
+    assert frontend.stats()['rejected'] == 1
+    assert frontend.stats()['completed'] == 2
+
+
+def test_deadline_expires_while_queued():
+    async def scenario(frontend, predictor):
+        busy = await occupy_worker(frontend, predictor)
+
+        with pytest.raises(DeadlineExceededError):
+            await frontend.predict('late', timeout=0.05)
+
+        predictor.gate.set()
+        await busy
+        await frontend._queue.join()
+
+    frontend, predictor = run(scenario)
+    assert predictor.seen == ['busy']
+    assert frontend.stats()['timed_out'] == 1
+
+
+def test_cancelled_request_never_reaches_the_model():
+    async def scenario(frontend, predictor):
+        busy = await occupy_worker(frontend, predictor)
+        queued = asyncio.ensure_future(frontend.predict('cancelled'))
+        await asyncio.sleep(0.01)
+
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+
+        predictor.gate.set()
+        await busy
+        await frontend._queue.join()
+
+    frontend, predictor = run(scenario)
+    assert predictor.seen == ['busy']
+    assert frontend.stats()['cancelled'] == 1
+
+
+def test_predict_fn_errors_reach_the_caller():
+    async def scenario(frontend, predictor):
+        with pytest.raises(ValueError, match='cannot score this'):
+            await frontend.predict('bad')
+
+    frontend, _ = run(scenario)
+    assert frontend.stats()['completed'] == 0
+
+
+def test_predict_blocking_from_another_thread():
+    predictor = GatedPredictor()
+    predictor.gate.set()
+    frontend = AsyncInferenceFrontend(predictor, num_workers=2)
+
+    with pytest.raises(RuntimeError):
+        frontend.predict_blocking('early')
+
+    loop = frontend.run_in_background()
+    assert frontend.predict_blocking('item') == {'item': 'item'}
+
+    async def shut_down():
+        for worker in frontend._workers:
+            worker.cancel()
+        await asyncio.gather(*frontend._workers, return_exceptions=True)
+
+    asyncio.run_coroutine_threadsafe(shut_down(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
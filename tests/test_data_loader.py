@@ -0,0 +1,95 @@
+import json
+
+import pandas as pd
+import pytest
+
+import data_loader
+from data_loader import SAMPLING_STRATEGIES, HAM10000DataLoader
+
+# (dx, number of lesions); lesion i of a class has 1 + i % 3 images
+CLASSES = [('nv', 40), ('mel', 15), ('bkl', 10), ('df', 5)]
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    rows = []
+    for dx, lesions in CLASSES:
+        for i in range(lesions):
+            for j in range(1 + i % 3):
+                rows.append({'lesion_id': f'HAM_{dx}_{i:03d}', 'image_id': f'ISIC_{dx}_{i:03d}_{j}', 'dx': dx})
+    pd.DataFrame(rows).to_csv(tmp_path / 'HAM10000_metadata.csv', index=False)
+    return tmp_path
+
+
+def saved_split(data_dir):
+    return data_dir / 'cache' / 'split_lesion_val20_seed42.json'
+
+
+def test_lesion_split_keeps_each_lesion_on_one_side(data_dir):
+    loader = HAM10000DataLoader(str(data_dir))
+    is_val = loader.lesion_split(0.2)
+
+    sides = loader.metadata.assign(is_val=is_val).groupby('lesion_id')['is_val'].nunique()
+    assert (sides == 1).all()
+    assert 0 < is_val.sum() < len(is_val)
+    assert set(loader.metadata['dx'][is_val]) == {dx for dx, _ in CLASSES}
+
+
+def test_lesion_split_reuses_saved_split(data_dir):
+    HAM10000DataLoader(str(data_dir)).lesion_split(0.2)
+    index = json.loads(saved_split(data_dir).read_text())
+    index['val_image_ids'] = ['ISIC_nv_000_0']
+    saved_split(data_dir).write_text(json.dumps(index))
+
+    loader = HAM10000DataLoader(str(data_dir))
+    is_val = loader.lesion_split(0.2)
+    assert loader.metadata['image_id'][is_val].tolist() == ['ISIC_nv_000_0']
+
+
+def test_lesion_split_recomputed_when_split_version_changes(data_dir, monkeypatch):
+    expected = HAM10000DataLoader(str(data_dir)).lesion_split(0.2)
+    index = json.loads(saved_split(data_dir).read_text())
+    index['val_image_ids'] = ['ISIC_nv_000_0']
+    saved_split(data_dir).write_text(json.dumps(index))
+
+    monkeypatch.setattr(data_loader, 'SPLIT_VERSION', 'lesion-sgkf-test')
+    is_val = HAM10000DataLoader(str(data_dir)).lesion_split(0.2)
+    assert (is_val == expected).all()
+    assert json.loads(saved_split(data_dir).read_text())['version'] == 'lesion-sgkf-test'
+
+
+def test_train_val_split_shares_no_lesion(data_dir):
+    train_df, val_df = HAM10000DataLoader(str(data_dir)).train_val_split(20, 0.2, strategy='oversample')
+
+    assert not set(train_df['lesion_id']) & set(val_df['lesion_id'])
+    assert (train_df['dx'].value_counts() == 16).all()
+    assert not val_df['image_id'].duplicated().any()
+
+
+@pytest.mark.parametrize('strategy', SAMPLING_STRATEGIES)
+def test_sample_balanced_is_reproducible(data_dir, strategy):
+    loader = HAM10000DataLoader(str(data_dir))
+    first = loader.sample_balanced(12, strategy, seed=7)
+
+    pd.testing.assert_frame_equal(first, loader.sample_balanced(12, strategy, seed=7))
+    assert not first.equals(loader.sample_balanced(12, strategy, seed=8))
+
+
+def test_oversample_gives_every_class_exactly_max_per_class(data_dir):
+    sample = HAM10000DataLoader(str(data_dir)).sample_balanced(25, 'oversample')
+
+    assert sample['dx'].value_counts().to_dict() == {dx: 25 for dx, _ in CLASSES}
+    # df has only 9 images, each repeated 2 or 3 times
+    assert set(sample[sample['dx'] == 'df']['image_id'].value_counts()) == {2, 3}
+
+
+def test_lesion_sampling_takes_one_image_per_lesion(data_dir):
+    sample = HAM10000DataLoader(str(data_dir)).sample_balanced(12, 'lesion')
+
+    assert not sample['lesion_id'].duplicated().any()
+    assert sample['dx'].value_counts().to_dict() == {'nv': 12, 'mel': 12, 'bkl': 10, 'df': 5}
+
+
+def test_unknown_sampling_strategy_is_rejected(data_dir):
+    with pytest.raises(ValueError, match='Unknown sampling strategy'):
+        HAM10000DataLoader(str(data_dir)).sample_balanced(10, 'smote')
@@ -0,0 +1,46 @@
+from prediction_cache import PredictionCache
+
+
+def test_key_depends_on_image_bytes_and_model_version():
+    key = PredictionCache.key(b'image', 'v1')
+
+    assert key == PredictionCache.key(b'image', 'v1')
+    assert key != PredictionCache.key(b'other image', 'v1')
+    assert key != PredictionCache.key(b'image', 'v2')
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_entries=2)
+    cache.put('a', {'nv': 0.1})
+    cache.put('b', {'nv': 0.2})
+    cache.get('a')
+    cache.put('c', {'nv': 0.3})
+
+    assert cache.get('b') is None
+    assert cache.get('a') == {'nv': 0.1}
+    assert cache.get('c') == {'nv': 0.3}
+    assert cache.stats()['entries'] == 2
+
+
+def test_hit_and_miss_counters():
+    cache = PredictionCache()
+    assert cache.stats()['hit_rate'] == 0.0
+
+    cache.get('a')
+    cache.put('a', {'nv': 0.5})
+    cache.get('a')
+    cache.get('a')
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (2, 1)
+    assert stats['hit_rate'] == 2 / 3
+
+
+def test_cached_results_are_copies():
+    cache = PredictionCache()
+    result = {'nv': 0.5}
+    cache.put('a', result)
+    result['nv'] = 0.9
+    cache.get('a')['nv'] = 0.0
+
+    assert cache.get('a') == {'nv': 0.5}
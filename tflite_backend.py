@@ -0,0 +1,100 @@
+"""Quantized TensorFlow Lite conversion and inference for CPU-only serving"""
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+# Supported post-training quantization modes
+QUANTIZATION_MODES = ('dynamic', 'int8')
+
+
+def _interpreter_class():
+    """The standalone LiteRT interpreter if installed, else the one bundled with TensorFlow"""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+def convert_model(model, quantization='dynamic', representative_images=None):
+    """Convert a Keras model taking ``(N, 224, 224, 3)`` pixels to a quantized TFLite flatbuffer.
+
+    ``'dynamic'`` stores weights as int8 and keeps float activations.
+    ``'int8'`` quantizes activations too, using ranges calibrated on
+    ``representative_images`` (a uint8 array of model inputs), and takes uint8
+    pixels directly as input. Both keep float32 probabilities as output.
+    """
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization {quantization!r}, expected one of {QUANTIZATION_MODES}")
+
+    import tensorflow as tf
+
+    export_dir = tempfile.mkdtemp(prefix='ham10000-saved-model-')
+    try:
+        model.export(export_dir, format='tf_saved_model', verbose=False)
+        converter = tf.lite.TFLiteConverter.from_saved_model(export_dir)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+        if quantization == 'int8':
+            if representative_images is None or len(representative_images) == 0:
+                raise ValueError("Full-integer quantization needs representative images for calibration")
+
+            def representative_dataset():
+                for image in representative_images:
+                    yield [image[np.newaxis].astype(np.float32)]
+
+            converter.representative_dataset = representative_dataset
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+            converter.inference_input_type = tf.uint8
+
+        return converter.convert()
+    finally:
+        shutil.rmtree(export_dir, ignore_errors=True)
+
+
+class TFLiteRunner:
+    """Runs a TFLite classifier on uint8 batches of any size.
+
+    The interpreter is not thread-safe, so calls are serialized.
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        self.model_path = model_path
+        self.size_bytes = os.path.getsize(model_path)
+        self._interpreter = _interpreter_class()(model_path=model_path, num_threads=num_threads or os.cpu_count())
+        self._input = self._interpreter.get_input_details()[0]
+        self._output_index = self._interpreter.get_output_details()[0]['index']
+        self._batch_size = None
+        self._lock = threading.Lock()
+
+    def _quantize_input(self, inputs):
+        """Map pixels onto the input tensor's dtype, applying its ``(scale, zero_point)`` if quantized.
+
+        The converter derives the scale from the calibration range, so it is
+        only 1 when the representative images span the full 0-255 range.
+        """
+        dtype = self._input['dtype']
+        scale, zero_point = self._input['quantization']
+        if not scale or not np.issubdtype(dtype, np.integer) or (scale, zero_point) == (1.0, 0):
+            return inputs.astype(dtype, copy=False)
+
+        limits = np.iinfo(dtype)
+        quantized = np.round(inputs.astype(np.float32) / scale + zero_point)
+        return np.clip(quantized, limits.min, limits.max).astype(dtype)
+
+    def run(self, inputs):
+        """Return the ``(N, num_classes)`` probabilities for a ``(N, 224, 224, 3)`` uint8 batch"""
+        inputs = np.asarray(inputs)
+        with self._lock:
+            if inputs.shape[0] != self._batch_size:
+                self._interpreter.resize_tensor_input(self._input['index'], inputs.shape)
+                self._interpreter.allocate_tensors()
+                self._batch_size = inputs.shape[0]
+
+            self._interpreter.set_tensor(self._input['index'], self._quantize_input(inputs))
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._output_index).copy()
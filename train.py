@@ -0,0 +1,64 @@
+"""Train the skin lesion classifier offline and write the model artifact.
+
+Example:
+    python train.py --data-dir data --epochs 10 --max-per-class 500 --num-workers 8
+"""
+import argparse
+import os
+import sys
+
+from data_loader import SAMPLING_STRATEGIES
+from model import DEFAULT_TRAINING_CONFIG, SkinLesionModel
+from model_registry import ModelRegistry
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the HAM10000 skin lesion classifier")
+    parser.add_argument('--data-dir', default='data', help="directory holding HAM10000_metadata.csv and the images")
+    parser.add_argument('--epochs', type=int, default=DEFAULT_TRAINING_CONFIG['epochs'])
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_TRAINING_CONFIG['batch_size'])
+    parser.add_argument('--max-per-class', type=int, default=DEFAULT_TRAINING_CONFIG['max_per_class'],
+                        help="cap on sampled images per diagnosis class")
+    parser.add_argument('--sampling', choices=SAMPLING_STRATEGIES, default=DEFAULT_TRAINING_CONFIG['sampling'],
+                        help="'undersample' caps each class, 'oversample' also repeats images of smaller "
+                             "classes, 'lesion' caps each class with one image per lesion")
+    parser.add_argument('--num-workers', type=int, default=None, help="image decode workers (default: all cores)")
+    parser.add_argument('--output', default='models', help="model registry directory the artifact is written to")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--streaming', action='store_true', help="decode images lazily through tf.data")
+    mode.add_argument('--cached-features', action='store_true',
+                      help="run the frozen backbone once and train only the head on cached features")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    metadata_path = os.path.join(args.data_dir, 'HAM10000_metadata.csv')
+    if not os.path.exists(metadata_path):
+        print(f"❌ Dataset not found at {metadata_path}")
+        return 1
+
+    model = SkinLesionModel.for_training(args.data_dir, registry=ModelRegistry(args.output))
+    history = model.train_with_real_data(
+        streaming=args.streaming,
+        max_per_class=args.max_per_class,
+        epochs=args.epochs,
+        batch_size=args.batch_size,
+        cached_features=args.cached_features,
+        num_workers=args.num_workers,
+        sampling=args.sampling,
+    )
+
+    if history is None:
+        print("❌ Training failed, no model artifact was written")
+        return 1
+
+    final_accuracy = history.history.get('val_accuracy', [None])[-1]
+    if final_accuracy is not None:
+        print(f"📈 Final validation accuracy: {final_accuracy:.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
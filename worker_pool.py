@@ -0,0 +1,294 @@
+"""Multi-process inference: N worker processes, each scoring requests from its own queue.
+
+The parent exports the loaded model once as an architecture file plus a
+single flat float32 weights file, which every worker memory-maps read-only
+to build its network. Only that file is shared (its pages sit once in the
+page cache); each worker copies the weights into its own TensorFlow
+variables, so at runtime every worker holds a full private model.
+"""
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+ARCHITECTURE_FILE = 'architecture.json'
+WEIGHTS_FILE = 'weights.npy'
+WEIGHTS_INDEX_FILE = 'weights.json'
+
+
+def export_shared_weights(model, directory):
+    """Write ``model``'s architecture and all of its weights, concatenated, to ``directory``"""
+    os.makedirs(directory, exist_ok=True)
+    weights = model.get_weights()
+
+    flat = np.lib.format.open_memmap(os.path.join(directory, WEIGHTS_FILE), mode='w+', dtype=np.float32,
+                                     shape=(sum(w.size for w in weights),))
+    offset = 0
+    for w in weights:
+        flat[offset:offset + w.size] = w.ravel()
+        offset += w.size
+    flat.flush()
+    del flat
+
+    with open(os.path.join(directory, WEIGHTS_INDEX_FILE), 'w') as f:
+        json.dump({'shapes': [list(w.shape) for w in weights]}, f)
+    with open(os.path.join(directory, ARCHITECTURE_FILE), 'w') as f:
+        f.write(model.to_json())
+
+
+def load_shared_weights(directory):
+    """Rebuild the model exported by ``export_shared_weights`` from the memory-mapped weights file.
+
+    ``set_weights`` copies the weights into the model's variables, so the
+    returned model does not share memory with the file or other workers.
+    """
+    from tensorflow import keras
+
+    with open(os.path.join(directory, ARCHITECTURE_FILE)) as f:
+        model = keras.models.model_from_json(f.read())
+    with open(os.path.join(directory, WEIGHTS_INDEX_FILE)) as f:
+        shapes = json.load(f)['shapes']
+
+    flat = np.load(os.path.join(directory, WEIGHTS_FILE), mmap_mode='r')
+    weights, offset = [], 0
+    for shape in shapes:
+        size = int(np.prod(shape))
+        weights.append(flat[offset:offset + size].reshape(shape))
+        offset += size
+
+    model.set_weights(weights)
+    return model
+
+
+def _worker_main(weights_dir, requests, results, max_batch_size, max_wait, intra_op_threads):
+    """Entry point of a worker process"""
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    from model import make_serving_function
+
+    serve = make_serving_function(load_shared_weights(weights_dir))
+    results.put(('ready', os.getpid(), None))
+
+    while True:
+        item = requests.get()
+        if item is None:
+            return
+
+        # Take whatever else arrives within max_wait of the first request, up to a full batch
+        batch = [item]
+        stopping = False
+        deadline = time.monotonic() + max_wait
+        while len(batch) < max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = requests.get(timeout=remaining) if remaining > 0 else requests.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stopping = True
+                break
+            batch.append(item)
+
+        request_ids = [request_id for request_id, _ in batch]
+        try:
+            probabilities = serve(np.stack([model_input for _, model_input in batch])).numpy()
+            for request_id, row in zip(request_ids, probabilities):
+                results.put(('result', request_id, row))
+        except Exception as e:
+            for request_id in request_ids:
+                results.put(('error', request_id, str(e)))
+
+        if stopping:
+            return
+
+
+class InferenceWorkerPool:
+    """Scores model inputs on ``num_workers`` processes, sending each request to the least busy one.
+
+    Offers the same ``submit``/``stats``/``stop`` interface as
+    ``serve.MicroBatcher``. Each worker also batches the requests that arrive
+    within ``max_wait_ms`` of the first one it takes, up to ``max_batch_size``.
+    Every worker has its own request queue: a worker killed while reading
+    from a shared queue would leave its lock held and stall the others.
+    """
+
+    def __init__(self, model, num_workers=2, max_batch_size=8, max_wait_ms=0.0, weights_dir=None,
+                 start_timeout=300.0):
+        """Export ``model`` (a loaded ``SkinLesionModel``) and start the workers"""
+        if getattr(model, 'model', None) is None:
+            raise ValueError("The worker pool serves the Keras model; it cannot share a TFLite or ONNX backend")
+        self.class_names = list(model.class_names)
+        self.num_workers = num_workers
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.items = 0
+        self.errors = 0
+
+        self._owns_weights_dir = weights_dir is None
+        self.weights_dir = weights_dir or tempfile.mkdtemp(prefix='ham10000-weights-')
+        export_shared_weights(model.model, self.weights_dir)
+
+        # Workers split the cores between them instead of each spawning one thread per core
+        intra_op_threads = max(1, (os.cpu_count() or 1) // num_workers)
+
+        # TensorFlow is not fork-safe once initialized, so workers start from a fresh interpreter
+        context = multiprocessing.get_context('spawn')
+        self._requests = [context.Queue() for _ in range(num_workers)]
+        self._results = context.Queue()
+        self._processes = [
+            context.Process(target=_worker_main, name=f"inference-worker-{i}", daemon=True,
+                            args=(self.weights_dir, self._requests[i], self._results,
+                                  max_batch_size, self.max_wait, intra_op_threads))
+            for i in range(num_workers)
+        ]
+        for process in self._processes:
+            process.start()
+
+        self._pending = {}
+        self._owners = {}
+        self._outstanding = [0] * num_workers
+        self._dead = set()
+        self._stopping = False
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._wait_until_ready(start_timeout)
+
+        self._dispatcher = threading.Thread(target=self._dispatch, name="worker-pool-results", daemon=True)
+        self._dispatcher.start()
+        print(f"👷 Started {num_workers} inference worker processes")
+
+    def _wait_until_ready(self, timeout):
+        deadline = time.monotonic() + timeout
+        ready = 0
+        while ready < self.num_workers:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not all(process.is_alive() for process in self._processes):
+                self.stop()
+                raise RuntimeError(f"Only {ready} of {self.num_workers} inference workers started")
+            try:
+                kind, _, _ = self._results.get(timeout=min(remaining, 1.0))
+            except queue.Empty:
+                continue
+            if kind == 'ready':
+                ready += 1
+
+    def worker_pids(self):
+        return [process.pid for process in self._processes]
+
+    def submit(self, model_input):
+        """Queue one ``(224, 224, 3)`` uint8 input; returns a Future of its result dict"""
+        future = Future()
+        with self._lock:
+            alive = [i for i in range(self.num_workers) if i not in self._dead]
+            if not alive:
+                future.set_exception(RuntimeError("Every inference worker has died"))
+                return future
+            worker = min(alive, key=self._outstanding.__getitem__)
+            request_id = self._next_id
+            self._next_id += 1
+            self._pending[request_id] = future
+            self._owners[request_id] = worker
+            self._outstanding[worker] += 1
+        self._requests[worker].put((request_id, model_input))
+        return future
+
+    def predict_inputs(self, inputs):
+        """Score a ``(N, 224, 224, 3)`` uint8 batch across the workers, like ``SkinLesionModel.predict_inputs``"""
+        return [future.result() for future in [self.submit(model_input) for model_input in inputs]]
+
+    def _dispatch(self):
+        next_check = time.monotonic()
+        while True:
+            if time.monotonic() >= next_check:
+                self._fail_dead_workers()
+                next_check = time.monotonic() + 1.0
+            try:
+                kind, key, payload = self._results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if kind == 'stop':
+                return
+
+            with self._lock:
+                future = self._pending.pop(key, None)
+                worker = self._owners.pop(key, None)
+                if worker is not None:
+                    self._outstanding[worker] -= 1
+            if future is None:
+                continue
+
+            if kind == 'result':
+                self.items += 1
+                future.set_result({name: float(payload[i]) for i, name in enumerate(self.class_names)})
+            else:
+                self.errors += 1
+                future.set_exception(RuntimeError(payload))
+
+    def _fail_requests(self, request_ids, message):
+        """Fail the futures of ``request_ids`` that are still pending (call with ``_lock`` held)"""
+        for request_id in request_ids:
+            worker = self._owners.pop(request_id, None)
+            if worker is not None:
+                self._outstanding[worker] -= 1
+            future = self._pending.pop(request_id, None)
+            if future is not None:
+                self.errors += 1
+                future.set_exception(RuntimeError(message))
+
+    def _fail_dead_workers(self):
+        """Fail the requests sent to workers that have died and stop routing to them"""
+        if self._stopping:
+            return
+        for i, process in enumerate(self._processes):
+            if i in self._dead or process.is_alive():
+                continue
+            print(f"❌ Inference worker {process.pid} died (exit code {process.exitcode})")
+            with self._lock:
+                self._dead.add(i)
+                held = [request_id for request_id, worker in self._owners.items() if worker == i]
+                self._fail_requests(held, f"Inference worker {process.pid} died")
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'workers': self.num_workers,
+            'alive_workers': sum(process.is_alive() for process in self._processes),
+            'dead_workers': len(self._dead),
+            'items': self.items,
+            'errors': self.errors,
+            'pending': pending,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+        }
+
+    def stop(self):
+        self._stopping = True
+        for requests in self._requests:
+            requests.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+
+        self._results.put(('stop', None, None))
+        if getattr(self, '_dispatcher', None) is not None:
+            self._dispatcher.join(timeout=10)
+
+        with self._lock:
+            for future in self._pending.values():
+                future.set_exception(RuntimeError("Inference worker pool stopped"))
+            self._pending.clear()
+
+        if self._owns_weights_dir:
+            shutil.rmtree(self.weights_dir, ignore_errors=True)